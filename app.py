@@ -1,36 +1,127 @@
 import os
+import time
+import pandas as pd
 import streamlit as st
-import subprocess
-import zipfile
-from process_video import process_video
-
-# ✅ Run cleanup script at the start
-try:
-    subprocess.run(["python", "cleanup.py"], check=True)
-except Exception as e:
-    st.warning(f"⚠️ Cleanup script failed: {e}")
+from process_video import stream_video
+from debug_writer import build_frames_zip
+from workspace import JobWorkspace, cleanup_stale_jobs
+from metrics import format_prometheus
+from detection_store import DetectionStore
+import model_registry
 
 # ✅ Set Streamlit page layout
 st.set_page_config(layout="wide")
 st.title("🎥 Video Transcription & Analysis")
 
-UPLOAD_DIR = "uploads"
-DEBUG_DIR = "debug_frames"
+WARM_UP_MODELS = os.environ.get("WARM_UP_MODELS", "1") == "1"  # ✅ Set to 0 to load models on first use instead
+LIVE_TABLE_REFRESH_SEC = 1.0  # ✅ Re-render the live frame table at most this often
+
+@st.cache_resource
+def warm_up_models():
+    """Loads every registered model once per server process, shared by all sessions."""
+    return model_registry.warm_up()
+
+if WARM_UP_MODELS:
+    with st.spinner("Loading models..."):
+        warm_up_models()
+
+# ✅ Each browser session works in its own job workspace, so sessions never overwrite each other
+if "job_id" not in st.session_state:
+    st.session_state.job_id = JobWorkspace().job_id
+workspace = JobWorkspace(st.session_state.job_id)
+workspace.touch()
+cleanup_stale_jobs(keep=(workspace.job_id,))  # ✅ Replaces the old wipe-everything cleanup on every run
+
+# ✅ Debug frame settings
+debug_frames_mode = st.sidebar.selectbox("🖼️ Debug Frames", ["full", "thumbnail", "off"], help="Thumbnails are downscaled before JPEG encoding")
+debug_every_n = st.sidebar.number_input("Save every Nth analysed frame", min_value=1, value=1, step=1)
+face_detector = st.sidebar.selectbox("🙂 Face Detector", ["opencv", "retinaface"], help="opencv is fast; retinaface finds small and turned faces")
+reuse_frames = st.sidebar.checkbox("♻️ Reuse results for near-duplicate frames", value=False, help="Speeds up static footage such as lectures or CCTV")
+memo_distance = st.sidebar.slider("Max hash distance (bits of 64)", 0, 16, 4) if reuse_frames else None
+decoder = st.sidebar.selectbox("🎞️ Decoder", ["opencv", "ffmpeg"], help="ffmpeg samples and downscales frames inside the decoder (faster on 4K)")
+profile_run = st.sidebar.checkbox("🧪 Profile stages (cProfile)", value=False, help="Writes one .prof file per stage")
 
 # ✅ Upload Section
 uploaded_file = st.file_uploader("📤 Upload Video", type=["mp4", "avi", "mov", "mkv"], help="Limit 200MB per file")
 
 if uploaded_file:
-    # ✅ Save the uploaded video inside `uploads/`
-    video_path = os.path.join(UPLOAD_DIR, "uploaded_video.mp4")
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-    with open(video_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
-
-    with st.spinner("Processing video... Please wait."):
-        results = process_video(video_path)
+    run_key = (uploaded_file.name, uploaded_file.size, debug_frames_mode, int(debug_every_n), face_detector, memo_distance, decoder, profile_run)
+
+    # ✅ Only process when the upload or settings change; widget reruns reuse the session's results
+    if st.session_state.get("run_key") != run_key:
+        # ✅ Start a fresh workspace for the new run and drop this session's previous one
+        workspace.remove()
+        workspace = JobWorkspace()
+        st.session_state.job_id = workspace.job_id
+
+        # ✅ Save the uploaded video inside this job's `uploads/`
+        video_path = workspace.upload_path(uploaded_file.name)
+        with open(video_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+
+        # ✅ Until the final result arrives, session results hold what has been streamed so far,
+        # so pressing Stop (which reruns the script) keeps the partial analysis
+        partial = {
+            "job_id": workspace.job_id,
+            "frames_dir": workspace.frames_dir,
+            "detections": DetectionStore.from_rows([], workspace.frames_dir),
+            "transcription": "",
+            "scene_changes": [],
+            "speech_summary": "Processing was stopped before the summary was generated.",
+            "stopped": True
+        }
+        st.session_state.results = partial
+        st.session_state.video_path = video_path
+        st.session_state.run_key = run_key
+
+        st.button("⏹️ Stop Processing")  # ✅ Any click reruns the script, which closes the generator below
+        progress_bar = st.progress(0.0, text="Processing video...")
+        live_transcript = st.empty()
+        live_scenes = st.empty()
+        live_table = st.empty()
+        rows = []
+        segments = []
+        last_refresh = 0.0
+
+        events = stream_video(video_path, debug_frames_mode=debug_frames_mode, debug_every_n=int(debug_every_n),
+                              workspace=workspace, profile=profile_run, decoder=decoder,
+                              face_detector=face_detector, memo_distance=memo_distance)
+        try:
+            for event in events:
+                if event["type"] == "frame":
+                    rows.append(event["row"])
+                    if event["progress"] is not None:
+                        progress_bar.progress(event["progress"], text=f"Analysed {len(rows)} frames ({event['progress']:.0%})")
+                    if time.perf_counter() - last_refresh >= LIVE_TABLE_REFRESH_SEC:
+                        live_table.dataframe(pd.DataFrame(rows).drop(columns=["detections", "faces"], errors="ignore"))
+                        last_refresh = time.perf_counter()
+                elif event["type"] == "scene":
+                    partial["scene_changes"].append((event["start"], event["end"]))
+                    live_scenes.markdown(f"🎬 **Scenes so far:** {len(partial['scene_changes'])}")
+                elif event["type"] == "transcript":
+                    segments.append(event["text"])
+                    partial["transcription"] = " ".join(segments)
+                    live_transcript.markdown(f"📝 **Live transcript:** {partial['transcription'][-1000:]}")  # ✅ Not a widget, so safe to redraw
+                elif event["type"] == "result":
+                    st.session_state.results = event["results"]
+        finally:
+            events.close()
+            partial["detections"] = DetectionStore.from_rows(rows, workspace.frames_dir)
+
+        for placeholder in (progress_bar, live_transcript, live_scenes, live_table):
+            placeholder.empty()
+
+    results = st.session_state.results
+    video_path = st.session_state.video_path
+
+    if results.get("error"):
+        st.error(results["error"])
+        st.stop()
+    if results.get("stopped"):
+        st.info("⏹️ Processing was stopped early; showing the partial results.")
+        if st.button("🔄 Process Full Video"):
+            st.session_state.run_key = None
+            st.rerun()
 
    
     col1, col2 = st.columns([2, 1]) 
@@ -59,7 +150,7 @@ if uploaded_file:
 
     # ✅ Display Object Detection & Emotion Analysis as a Table
     st.markdown("<h3 style='text-align: center;'>📊 Object Detection & Emotion Analysis</h3>", unsafe_allow_html=True)
-    st.dataframe(results["frame_analysis"])
+    st.dataframe(results["detections"].display_frame())  # ✅ Built from the columnar store on first render
 
     # ✅ Attach Subtitle File (if available)
     if "srt_file" in results and results["srt_file"] and os.path.exists(results["srt_file"]):
@@ -77,11 +168,40 @@ if uploaded_file:
         elif key in ["audio_debug_file", "final_audio_file", "transcription_debug_file"] and not debug_file:
             st.warning(f"⚠️ {key.replace('_', ' ').title()} not found.")
 
+    # ✅ Performance Metrics - collapsed by default
+    if results.get("metrics"):
+        with st.expander("📈 Performance Metrics"):
+            metrics = results["metrics"]
+            counters = metrics.get("counters", {})
+            col_wall, col_cpu, col_rss, col_frames = st.columns(4)
+            col_wall.metric("Wall time", f"{metrics['wall_sec']:.2f}s")
+            col_cpu.metric("CPU time", f"{metrics['process_cpu_sec']:.2f}s")
+            col_rss.metric("Peak RSS", f"{metrics['peak_rss_mb']:.0f} MB")
+            col_frames.metric("Frames analysed / decoded", f"{counters.get('frames_analysed', 0)} / {counters.get('frames_decoded', 0)}")
+            if counters.get("memo_lookups"):
+                st.caption(f"♻️ Reused results for {counters.get('memo_hits', 0)} of {counters['memo_lookups']} sampled frames")
+
+            st.markdown("**Stages**")
+            st.dataframe([{"stage": name, **stage} for name, stage in metrics["stages"].items()])
+            if metrics.get("gauges"):
+                st.markdown("**Frame pipeline** (queue depth in batches, utilisation = busy / wall time)")
+                st.dataframe([{"gauge": gauge["name"], **gauge["labels"], "value": gauge["value"]} for gauge in metrics["gauges"]])
+            if metrics.get("latency"):
+                st.markdown("**Inference latency (ms)**")
+                st.dataframe([{"operation": name, **summary} for name, summary in metrics["latency"].items()])
+            for stage, profile_path in metrics.get("profiles", {}).items():
+                if os.path.exists(profile_path):
+                    with open(profile_path, "rb") as profile_file:
+                        st.download_button(label=f"📥 Download {stage} profile", data=profile_file.read(),
+                                           file_name=os.path.basename(profile_path), mime="application/octet-stream")
+
+            st.download_button(label="📥 Download Prometheus Metrics", data=format_prometheus(metrics, {"job": results.get("job_id", "")}),
+                               file_name="metrics.prom", mime="text/plain")
+
     # ✅ Debugging Frames - Save and Download ZIP Inside `debug_frames/`
     st.markdown("<h3 style='text-align: center;'>📸 Debugging Frames</h3>", unsafe_allow_html=True)
 
-    frame_folder = "debug_frames/"
-    zip_file_path = os.path.join(frame_folder, "debug_frames.zip")  # ✅ Save ZIP in `debug_frames/`
+    frame_folder = results.get("frames_dir") or workspace.frames_dir
 
     if os.path.exists(frame_folder) and os.listdir(frame_folder):
         frame_files = sorted(os.listdir(frame_folder))
@@ -91,16 +211,12 @@ if uploaded_file:
             frame_path = os.path.join(frame_folder, frame_file)
             st.image(frame_path, caption=f"{frame_file}", use_container_width=True)
 
-        # ✅ Create ZIP file for all frames inside `debug_frames/`
-        try:
-            with zipfile.ZipFile(zip_file_path, "w") as zipf:
-                for frame_file in frame_files:
-                    zipf.write(os.path.join(frame_folder, frame_file), arcname=frame_file)
-
-            # ✅ Add ZIP Download Button
-            with open(zip_file_path, "rb") as zip_file:
-                st.download_button(label="📥 Download All Frames", data=zip_file, file_name="debug_frames.zip", mime="application/zip")
-        except Exception as e:
-            st.error(f"❌ Error creating ZIP file: {e}")
+        # ✅ Build the ZIP only when a download is requested (JPEGs stored, not re-deflated)
+        if st.button("📦 Prepare Frames ZIP"):
+            try:
+                zip_bytes = build_frames_zip(frame_folder)
+                st.download_button(label="📥 Download All Frames", data=zip_bytes, file_name="debug_frames.zip", mime="application/zip")
+            except Exception as e:
+                st.error(f"❌ Error creating ZIP file: {e}")
     else:
         st.warning("⚠️ No frames available for debugging.")
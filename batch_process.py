@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+OUTPUT_DIR = "batch_results"
+
+def find_videos(source):
+    """Returns the video paths in a directory (recursively) or listed in a manifest file.
+
+    A manifest has one path per line; blank lines and `#` comments are ignored and
+    relative paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        videos = []
+        for root, _, files in os.walk(source):
+            videos.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+        return sorted(videos)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    videos = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                videos.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return videos
+
+def output_name(video_path):
+    """Returns a per-video output name that stays unique across directories."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+def is_done(video_path, output_dir):
+    """Returns True if a successful result for this video already exists (for resume)."""
+    json_path = os.path.join(output_dir, output_name(video_path) + ".json")
+    if not os.path.exists(json_path):
+        return False
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("status") == "ok"
+    except Exception:
+        return False  # ✅ Half-written or corrupt result: process again
+
+def init_worker(yolo_options=None):
+    """Loads every model once when a worker process starts."""
+    import process_video  # noqa: F401  # ✅ Registers the model loaders
+    import model_registry
+    if yolo_options:
+        from object_detection import configure_yolo
+        configure_yolo(**yolo_options)
+    model_registry.warm_up()
+
+def process_one(video_path, output_dir, options, output_format):
+    """Processes one video in a worker and writes its JSON (and optional Parquet) result."""
+    from process_video import process_video
+    from workspace import JobWorkspace
+
+    name = output_name(video_path)
+    workspace = JobWorkspace(job_id=name, root=os.path.join(output_dir, "jobs"))
+    start = time.perf_counter()
+    try:
+        results = process_video(video_path, workspace=workspace, **options)
+    except Exception as e:
+        results = {"error": f"{type(e).__name__}: {e}"}
+    wall_sec = time.perf_counter() - start
+
+    status = "error" if "error" in results else "ok"
+    detection_store = results.pop("detections", None)
+    record = {"video": video_path, "status": status, "wall_sec": round(wall_sec, 3), "results": results}
+    if detection_store is not None and output_format in ("json", "both"):
+        record["frame_analysis"] = detection_store.display_frame().to_dict("records")
+
+    if status == "ok" and results.get("srt_file") and os.path.exists(results["srt_file"]):
+        with open(results["srt_file"], "r", encoding="utf-8") as f:
+            record["subtitles"] = f.read()  # ✅ Keep subtitles with the result, not only as a path
+
+    if status == "ok" and results.get("metrics"):
+        from metrics import format_prometheus
+        with open(os.path.join(output_dir, name + ".prom"), "w", encoding="utf-8") as f:
+            f.write(format_prometheus(results["metrics"], {"video": name}))  # ✅ For node_exporter's textfile collector
+
+    if status == "ok" and output_format in ("parquet", "npy", "both") and detection_store is not None:
+        store_format = "npy" if output_format == "npy" else "parquet"
+        try:
+            # ✅ Frames, detections (with boxes and confidences) and faces as separate tables
+            detection_store.save(os.path.join(output_dir, name + ".detections"), store_format)
+        except Exception as e:
+            print(f"⚠️ Detection store export failed for {video_path} (is pyarrow installed for Parquet?): {e}")
+
+    # ✅ Write JSON last and atomically; its presence marks the video as done for resume
+    json_path = os.path.join(output_dir, name + ".json")
+    temp_path = json_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, default=str, indent=2)
+    os.replace(temp_path, json_path)
+
+    duration = (results.get("video_info") or {}).get("duration_sec") or 0.0
+    return {"video": video_path, "status": status, "wall_sec": wall_sec, "duration_sec": duration}
+
+def run_batch(videos, output_dir=OUTPUT_DIR, workers=2, options=None, output_format="json", resume=True, yolo_options=None):
+    """Processes `videos` on a pool of worker processes and returns aggregate throughput stats.
+
+    `yolo_options` are `configure_yolo` arguments; an exported backend is exported
+    here once (INT8 calibrated on frames from `videos`) before the workers start.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    options = options or {}
+    if yolo_options and yolo_options.get("backend", "pytorch") != "pytorch":
+        from object_detection import export_yolo
+        export_yolo(yolo_options["backend"], yolo_options.get("imgsz", 640), yolo_options.get("int8", False),
+                    yolo_options.get("calibration_dir"), calibration_videos=videos)
+
+    pending = [video for video in videos if not (resume and is_done(video, output_dir))]
+    skipped = len(videos) - len(pending)
+    if skipped:
+        print(f"⏭️ Skipping {skipped} already processed videos")
+    print(f"🎬 Processing {len(pending)} videos on {workers} workers")
+
+    summaries = []
+    batch_start = time.perf_counter()
+    # ✅ Spawned workers each load their own models once in init_worker
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(yolo_options,)) as executor:
+        futures = {executor.submit(process_one, video, output_dir, options, output_format): video for video in pending}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {"video": futures[future], "status": "error", "wall_sec": 0.0, "duration_sec": 0.0}
+                print(f"❌ Worker failed on {futures[future]}: {e}")
+            summaries.append(summary)
+            icon = "✅" if summary["status"] == "ok" else "❌"
+            print(f"{icon} [{len(summaries)}/{len(pending)}] {summary['video']} ({summary['wall_sec']:.1f}s)")
+
+    batch_wall = time.perf_counter() - batch_start
+    succeeded = [summary for summary in summaries if summary["status"] == "ok"]
+    video_seconds = sum(summary["duration_sec"] for summary in succeeded)
+
+    stats = {
+        "videos_total": len(videos),
+        "videos_skipped": skipped,
+        "videos_ok": len(succeeded),
+        "videos_failed": len(summaries) - len(succeeded),
+        "wall_sec": round(batch_wall, 3),
+        "videos_per_hour": round(len(succeeded) / batch_wall * 3600, 2) if batch_wall > 0 else 0.0,
+        "video_sec_processed": round(video_seconds, 3),
+        "realtime_factor": round(video_seconds / batch_wall, 3) if batch_wall > 0 else 0.0
+    }
+
+    with open(os.path.join(output_dir, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump({"stats": stats, "videos": summaries}, f, indent=2)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process a directory or manifest of videos without the Streamlit UI.")
+    parser.add_argument("source", help="Directory of videos or a manifest file with one path per line")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help="Where per-video results are written")
+    parser.add_argument("-w", "--workers", type=int, default=max((os.cpu_count() or 2) // 2, 1), help="Worker processes")
+    parser.add_argument("--format", choices=["json", "parquet", "npy", "both"], default="json",
+                        help="Frame analysis output: rows in the JSON, or a columnar detection store (parquet/npy); both = json + parquet")
+    parser.add_argument("--no-resume", action="store_true", help="Reprocess videos that already have a result")
+    parser.add_argument("--sampling-mode", choices=["grab", "seek", "keyframe"], default="grab")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between analysed frames")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="ffmpeg decodes through a rawvideo pipe with sampling and scaling done by FFmpeg")
+    parser.add_argument("--decode-width", type=int, default=1280, help="Max frame width for the ffmpeg decoder")
+    parser.add_argument("--debug-frames", choices=["full", "thumbnail", "off"], default="off")
+    parser.add_argument("--vad", action="store_true", help="Only transcribe speech regions")
+    parser.add_argument("--emotion-cascade", action="store_true", help="Only search for faces in person crops")
+    parser.add_argument("--face-detector", choices=["opencv", "retinaface", "mtcnn", "ssd", "yunet"], default="opencv",
+                        help="DeepFace face detector: opencv is fast, retinaface is accurate")
+    parser.add_argument("--yolo-backend", choices=["pytorch", "onnx", "openvino"], default="pytorch",
+                        help="Object detection runtime; onnx/openvino are exported once and cached next to the weights")
+    parser.add_argument("--yolo-int8", action="store_true", help="INT8-quantize the exported model, calibrated on frames from the batch")
+    parser.add_argument("--yolo-imgsz", type=int, default=640, help="YOLO input size")
+    parser.add_argument("--yolo-threads", type=int, default=0, help="Inference threads per worker (0 = runtime default)")
+    parser.add_argument("--memo-distance", type=int, default=None,
+                        help="Reuse results for sampled frames whose 64-bit perceptual hash is within this many bits of a recent frame")
+    parser.add_argument("--profile", action="store_true", help="Write a cProfile .prof file per stage into each job workspace")
+    parser.add_argument("--no-index", action="store_true", help="Don't add the videos to the search index")
+    args = parser.parse_args(argv)
+
+    videos = find_videos(args.source)
+    if not videos:
+        print(f"❌ No videos found in {args.source}")
+        return 1
+
+    options = {
+        "sampling_mode": args.sampling_mode,
+        "sample_interval_sec": args.sample_interval,
+        "debug_frames_mode": args.debug_frames,
+        "vad": args.vad,
+        "emotion_cascade": args.emotion_cascade,
+        "face_detector": args.face_detector,
+        "profile": args.profile,
+        "update_index": not args.no_index,
+        "decoder": args.decoder,
+        "decode_width": args.decode_width,
+        "memo_distance": args.memo_distance
+    }
+    yolo_options = {"backend": args.yolo_backend, "imgsz": args.yolo_imgsz, "threads": args.yolo_threads, "int8": args.yolo_int8}
+    stats = run_batch(videos, args.output_dir, args.workers, options, args.format, resume=not args.no_resume, yolo_options=yolo_options)
+
+    print("\n=== BATCH SUMMARY ===")
+    print(f"Videos: {stats['videos_ok']} ok, {stats['videos_failed']} failed, {stats['videos_skipped']} skipped")
+    print(f"Wall time: {stats['wall_sec']:.1f}s")
+    print(f"Throughput: {stats['videos_per_hour']:.1f} videos/hour | Realtime factor: {stats['realtime_factor']:.2f}x")
+    return 0 if stats["videos_failed"] == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+
+RESOLUTIONS = [(320, 240), (640, 360), (1280, 720)]
+FRAME_RATES = [15.0, 29.97]
+DURATIONS = [10.0]
+SCENE_LENGTH_SEC = 3.0  # ✅ Synthetic videos get a hard cut this often
+REGRESSION_THRESHOLD = 0.2  # ✅ 20% slower than the baseline counts as a regression
+MIN_REGRESSION_SEC = 0.005  # ✅ Ignore noise on stages that take only a few milliseconds
+PALETTE = [(40, 40, 160), (40, 160, 40), (160, 40, 40), (160, 160, 40), (40, 160, 160)]
+
+def make_synthetic_video(path, width, height, fps, duration_sec, audio="tone"):
+    """Writes a synthetic video with a moving block, hard scene cuts and optional audio.
+
+    `audio` is `tone` (440 Hz sine), `silence` or `none`. Audio needs FFmpeg; without
+    it the video is written silent.
+    """
+    from speech_processing import FFMPEG_PATH, ffmpeg_available
+
+    frame_total = int(round(duration_sec * fps))
+    scene_frames = max(int(round(SCENE_LENGTH_SEC * fps)), 1)
+    silent_path = path if audio == "none" else path + ".silent.mp4"
+
+    writer = cv2.VideoWriter(silent_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    block_width = max(width // 5, 1)
+    for index in range(frame_total):
+        scene = index // scene_frames
+        frame = np.full((height, width, 3), PALETTE[scene % len(PALETTE)], dtype=np.uint8)
+        x = int((index % scene_frames) / scene_frames * (width - block_width))
+        cv2.rectangle(frame, (x, height // 3), (x + block_width, 2 * height // 3), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+    if audio == "none":
+        return path
+    if not ffmpeg_available():
+        print("⚠️ FFmpeg not found; benchmark video has no audio track.")
+        os.replace(silent_path, path)
+        return path
+
+    source = f"sine=frequency=440:sample_rate=16000:duration={duration_sec}" if audio == "tone" else "anullsrc=r=16000:cl=mono"
+    command = [
+        FFMPEG_PATH, "-nostdin", "-loglevel", "error", "-y", "-i", silent_path, "-f", "lavfi", "-i", source,
+        "-t", str(duration_sec), "-c:v", "copy", "-c:a", "aac", "-shortest", path
+    ]
+    subprocess.run(command, check=True)
+    os.remove(silent_path)
+    return path
+
+def timed(func, *args, **kwargs):
+    """Returns `(result, seconds)` for one call."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def stage_record(seconds, items=1):
+    """Builds one stage entry of the benchmark JSON."""
+    return {
+        "wall_sec": round(seconds, 6),
+        "items": items,
+        "ms_per_item": round(seconds / items * 1000, 3) if items else None
+    }
+
+def benchmark_video(video_path, workdir, sample_interval_sec=0.5, batch_size=8):
+    """Times every pipeline stage on one video and returns `{stage: record}`."""
+    from frame_source import FrameSource, FFmpegFrameSource, FFMPEG_PATH
+    from scene_detection import segment_scenes
+    from object_detection import detect_objects, detect_objects_batch
+    from emotion_detection import detect_emotion, detect_emotions_batch
+    from speech_processing import extract_speech
+    from text_summarization import summarize_text
+    from process_video import process_video
+    from workspace import JobWorkspace
+
+    stages = {}
+
+    # ✅ Full decode of every frame
+    source = FrameSource(video_path)
+    start = time.perf_counter()
+    decoded = sum(1 for _ in source.frames())
+    stages["decode"] = stage_record(time.perf_counter() - start, decoded)
+    source.release()
+
+    # ✅ Sampled frames feed the per-frame model stages
+    source = FrameSource(video_path)
+    start = time.perf_counter()
+    sampled = [frame for _, _, frame in source.sample(sample_interval_sec)]
+    stages["sample"] = stage_record(time.perf_counter() - start, len(sampled))
+    source.release()
+
+    # ✅ Same sampling done inside FFmpeg (fps + scale filters) through a rawvideo pipe
+    if FFMPEG_PATH:
+        source = FFmpegFrameSource(video_path)
+        start = time.perf_counter()
+        sampled_count = sum(1 for _ in source.sample(sample_interval_sec))
+        stages["sample_ffmpeg"] = stage_record(time.perf_counter() - start, sampled_count)
+        source.release()
+
+    _, seconds = timed(segment_scenes, video_path)
+    stages["segment_scenes"] = stage_record(seconds)
+
+    _, seconds = timed(lambda: [detect_objects(frame) for frame in sampled])
+    stages["detect_objects"] = stage_record(seconds, len(sampled))
+
+    _, seconds = timed(detect_objects_batch, sampled, batch_size=batch_size)
+    stages["detect_objects_batch"] = stage_record(seconds, len(sampled))
+
+    _, seconds = timed(lambda: [detect_emotion(frame) for frame in sampled])
+    stages["detect_emotion"] = stage_record(seconds, len(sampled))
+
+    _, seconds = timed(detect_emotions_batch, sampled)
+    stages["detect_emotions_batch"] = stage_record(seconds, len(sampled))
+
+    speech_dir = os.path.join(workdir, "speech")
+    os.makedirs(speech_dir, exist_ok=True)
+    (transcript, _, _), seconds = timed(extract_speech, video_path, output_dir=speech_dir)
+    stages["extract_speech"] = stage_record(seconds)
+
+    _, seconds = timed(summarize_text, transcript)
+    stages["summarize_text"] = stage_record(seconds)
+
+    workspace = JobWorkspace(root=os.path.join(workdir, "jobs"))
+    _, seconds = timed(process_video, video_path, sample_interval_sec=sample_interval_sec, batch_size=batch_size,
+                       use_cache=False, debug_frames_mode="off", workspace=workspace, update_index=False)
+    stages["process_video"] = stage_record(seconds)
+    return stages
+
+def box_iou(box, boxes):
+    """IoU of one `[x1, y1, x2, y2]` box against an `(n, 4)` array of boxes."""
+    width = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    height = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    intersection = width * height
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum((box[2] - box[0]) * (box[3] - box[1]) + areas - intersection, 1e-9)
+
+def detection_map(predictions, references, iou_threshold=0.5):
+    """Returns the mAP@`iou_threshold` of `predictions`, treating `references` as ground truth.
+
+    Both are per-frame lists of `parse_detections` dicts. With the PyTorch
+    detections as references this measures the drift of an exported or
+    quantized backend without labelled data. Returns None if the references are empty.
+    """
+    class_ids = {detection["class_id"] for frame in references for detection in frame}
+    if not class_ids:
+        return None
+
+    average_precisions = []
+    for class_id in sorted(class_ids):
+        truth_count = 0
+        scored = []  # ✅ (confidence, matched a reference box)
+        for predicted, reference in zip(predictions, references):
+            truths = np.array([d["box"] for d in reference if d["class_id"] == class_id], dtype=np.float64).reshape(-1, 4)
+            truth_count += len(truths)
+            matched = np.zeros(len(truths), dtype=bool)
+            for detection in sorted((d for d in predicted if d["class_id"] == class_id), key=lambda d: -d["confidence"]):
+                hit = False
+                if len(truths):
+                    ious = np.where(matched, 0.0, box_iou(np.array(detection["box"]), truths))
+                    best = int(ious.argmax())
+                    if ious[best] >= iou_threshold:
+                        matched[best] = hit = True
+                scored.append((detection["confidence"], hit))
+
+        scored.sort(key=lambda item: -item[0])
+        hits = np.array([hit for _, hit in scored], dtype=np.float64)
+        true_positives, false_positives = np.cumsum(hits), np.cumsum(1 - hits)
+        recall = np.concatenate([[0.0], true_positives / truth_count, [1.0]])
+        precision = np.concatenate([[0.0], true_positives / np.maximum(true_positives + false_positives, 1e-9), [0.0]])
+        precision = np.maximum.accumulate(precision[::-1])[::-1]  # ✅ Precision envelope (all-point interpolation)
+        average_precisions.append(float(np.sum(np.diff(recall) * precision[1:])))
+    return round(float(np.mean(average_precisions)), 4)
+
+def benchmark_yolo_backends(frames, backends=("onnx", "openvino"), imgsz=640, threads=0, int8=False, batch_size=8,
+                            calibration_videos=None):
+    """Times YOLO on each exported backend against PyTorch on the same frames.
+
+    Every entry has the usual stage timing plus `speedup` over PyTorch and
+    `map50_vs_pytorch`, the mAP@0.5 of its detections against PyTorch's. With
+    `int8`, the INT8 variant of each backend is measured too. Backends whose
+    runtime is not installed are reported with an `error`.
+    """
+    from object_detection import load_yolo_model, export_yolo, parse_detections
+
+    def run(model):
+        model(frames[:1], verbose=False)  # ✅ Warm-up: first-call allocations are not timed
+        detections = []
+        start = time.perf_counter()
+        for index in range(0, len(frames), batch_size):
+            detections.extend(parse_detections(result) for result in model(frames[index:index + batch_size], verbose=False))
+        return detections, time.perf_counter() - start
+
+    reference, reference_sec = run(load_yolo_model("pytorch", imgsz, threads))
+    report = {"pytorch": {**stage_record(reference_sec, len(frames)), "speedup": 1.0, "map50_vs_pytorch": 1.0}}
+
+    variants = [(backend, False) for backend in backends] + ([(backend, True) for backend in backends] if int8 else [])
+    for backend, quantized in variants:
+        name = backend + ("_int8" if quantized else "")
+        try:
+            if quantized:
+                export_yolo(backend, imgsz, True, calibration_videos=calibration_videos)
+            model = load_yolo_model(backend, imgsz, threads, quantized)
+        except Exception as e:
+            print(f"⚠️ Skipping YOLO backend {name}: {e}")
+            report[name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+
+        detections, seconds = run(model)
+        report[name] = {
+            **stage_record(seconds, len(frames)),
+            "speedup": round(reference_sec / seconds, 2) if seconds > 0 else None,
+            "map50_vs_pytorch": detection_map(detections, reference)
+        }
+        print(f"⏱️ YOLO {name}: {report[name]['ms_per_item']} ms/frame, x{report[name]['speedup']}, "
+              f"mAP@0.5 vs PyTorch {report[name]['map50_vs_pytorch']}")
+    return report
+
+def case_key(width, height, fps, duration_sec):
+    """Returns the stable name used to match cases between runs."""
+    return f"{width}x{height}@{fps:g}fps_{duration_sec:g}s"
+
+def run_benchmark(resolutions=RESOLUTIONS, frame_rates=FRAME_RATES, durations=DURATIONS, audio="tone",
+                  use_stubs=False, workdir=None, sample_interval_sec=0.5, batch_size=8, yolo_backends=(), backend_video=None,
+                  yolo_imgsz=640, yolo_threads=0, yolo_int8=False):
+    """Generates every synthetic video in the matrix, times each stage and returns the report.
+
+    With `yolo_backends`, exported YOLO backends are also compared with PyTorch on
+    frames sampled from `backend_video` (default: the first synthetic video, which
+    has no real objects, so pass real footage for a meaningful mAP).
+    """
+    import model_registry
+    if use_stubs:
+        from benchmark_stubs import install_stubs
+        install_stubs()
+
+    owns_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="video_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    # ✅ Load models before timing so no stage pays the one-off load cost
+    import process_video  # noqa: F401  # ✅ Registers every model loader
+    model_stats = model_registry.warm_up()
+
+    cases = {}
+    backend_report = None
+    try:
+        for width, height in resolutions:
+            for fps in frame_rates:
+                for duration_sec in durations:
+                    key = case_key(width, height, fps, duration_sec)
+                    video_path = os.path.join(workdir, key + ".mp4")
+                    make_synthetic_video(video_path, width, height, fps, duration_sec, audio)
+
+                    print(f"⏱️ Benchmarking {key}")
+                    stages = benchmark_video(video_path, workdir, sample_interval_sec, batch_size)
+                    cases[key] = {
+                        "video": {"width": width, "height": height, "fps": fps, "duration_sec": duration_sec, "audio": audio},
+                        "stages": stages
+                    }
+                    backend_video = backend_video or video_path
+
+        if yolo_backends and use_stubs:
+            print("⚠️ YOLO backend comparison needs the real model; skipped with --stubs.")
+        elif yolo_backends:
+            from frame_source import FrameSource
+            source = FrameSource(backend_video)
+            frames = [frame for _, _, frame in source.sample(sample_interval_sec)]
+            source.release()
+            print(f"⏱️ Comparing YOLO backends on {len(frames)} frames of {backend_video}")
+            backend_report = benchmark_yolo_backends(frames, yolo_backends, yolo_imgsz, yolo_threads, yolo_int8, batch_size,
+                                                     calibration_videos=[backend_video])
+    finally:
+        if owns_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stubs": use_stubs,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "sample_interval_sec": sample_interval_sec,
+            "batch_size": batch_size,
+            "model_stats": model_stats
+        },
+        "cases": cases,
+        "yolo_backends": backend_report
+    }
+
+def compare_reports(baseline, current, threshold=REGRESSION_THRESHOLD, min_seconds=MIN_REGRESSION_SEC):
+    """Returns the stages that got more than `threshold` slower than in `baseline`."""
+    regressions = []
+    for key, case in current.get("cases", {}).items():
+        baseline_stages = baseline.get("cases", {}).get(key, {}).get("stages", {})
+        for stage, record in case["stages"].items():
+            before = baseline_stages.get(stage, {}).get("wall_sec")
+            after = record["wall_sec"]
+            if before is None or after - before < min_seconds:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append({"case": key, "stage": stage, "baseline_sec": before, "current_sec": after,
+                                    "change": round(after / before - 1, 3) if before > 0 else None})
+    return regressions
+
+def parse_resolutions(text):
+    return [tuple(int(part) for part in item.lower().split("x")) for item in text.split(",") if item]
+
+def parse_numbers(text):
+    return [float(item) for item in text.split(",") if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic videos.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--stubs", action="store_true", help="Use lightweight model stubs (offline, for CI)")
+    parser.add_argument("--resolutions", type=parse_resolutions, default=RESOLUTIONS, help="e.g. 320x240,1280x720")
+    parser.add_argument("--fps", type=parse_numbers, default=FRAME_RATES, help="e.g. 15,29.97")
+    parser.add_argument("--durations", type=parse_numbers, default=DURATIONS, help="Seconds, e.g. 5,30")
+    parser.add_argument("--audio", choices=["tone", "silence", "none"], default="tone")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workdir", help="Keep generated videos here instead of a temp dir")
+    parser.add_argument("--yolo-backends", type=lambda text: [item for item in text.split(",") if item], default=[],
+                        help="Compare exported YOLO backends with PyTorch, e.g. onnx,openvino")
+    parser.add_argument("--yolo-int8", action="store_true", help="Also measure the INT8-quantized backends")
+    parser.add_argument("--yolo-imgsz", type=int, default=640)
+    parser.add_argument("--yolo-threads", type=int, default=0, help="Inference threads (0 = runtime default)")
+    parser.add_argument("--backend-video", help="Real footage for the YOLO backend comparison (speed and mAP drift)")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.resolutions, args.fps, args.durations, args.audio, args.stubs, args.workdir,
+                           args.sample_interval, args.batch_size, args.yolo_backends, args.backend_video,
+                           args.yolo_imgsz, args.yolo_threads, args.yolo_int8)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark report saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"❌ {regression['case']} {regression['stage']}: {regression['baseline_sec']:.4f}s -> "
+                  f"{regression['current_sec']:.4f}s (+{regression['change']:.0%})")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
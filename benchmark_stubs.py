@@ -0,0 +1,127 @@
+import json
+import numpy as np
+import speech_processing
+import object_detection  # noqa: F401  # ✅ Import first so their real loaders are registered
+import emotion_detection  # noqa: F401  # ✅ before install_stubs() replaces them
+import text_summarization  # noqa: F401
+from model_registry import register_model
+
+class StubBoxes:
+    def __init__(self, rows):
+        self.data = self
+        self._rows = rows
+
+    def tolist(self):
+        return [list(row) for row in self._rows]
+
+class StubResult:
+    """Mimics the parts of an ultralytics Results object that object_detection reads."""
+    names = {0: "person", 16: "dog"}
+
+    def __init__(self, frame):
+        height, width = frame.shape[:2]
+        # ✅ One centred "person" box per frame: [x1, y1, x2, y2, confidence, class_id]
+        self.boxes = StubBoxes([[width * 0.25, height * 0.1, width * 0.75, height * 0.9, 0.9, 0]])
+
+class StubYOLO:
+    """Stands in for YOLO: returns one fixed detection per input frame."""
+    def __call__(self, frames, verbose=True):
+        frames = frames if isinstance(frames, list) else [frames]
+        return [StubResult(frame) for frame in frames]
+
+class StubDeepFace:
+    """Stands in for the DeepFace module: reports one neutral face per call."""
+    @staticmethod
+    def extract_faces(img_path, detector_backend="opencv", enforce_detection=True, align=True, **kwargs):
+        height, width = img_path.shape[:2]
+        return [{
+            "face": img_path,
+            "facial_area": {"x": width // 4, "y": height // 8, "w": width // 2, "h": height // 2},
+            "confidence": 0.9
+        }]
+
+    @staticmethod
+    def analyze(img, actions=None, enforce_detection=True, **kwargs):
+        height, width = img.shape[:2]
+        return [{
+            "dominant_emotion": "neutral",
+            "emotion": {"neutral": 99.0},
+            "face_confidence": 0.9,
+            "region": {"x": width // 4, "y": height // 8, "w": width // 2, "h": height // 2}
+        }]
+
+class StubEmotionModel:
+    """Stands in for DeepFace's Keras emotion model: every face is neutral."""
+    def predict_on_batch(self, batch):
+        probabilities = np.zeros((len(batch), 7), dtype=np.float32)
+        probabilities[:, 6] = 0.99
+        return probabilities
+
+class StubToken:
+    def __init__(self, text):
+        self.text = text
+        self.is_punct = text in {".", ",", "!", "?"}
+
+class StubSpan:
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        return iter(StubToken(word) for word in self.text.replace(".", " . ").split())
+
+class StubDoc:
+    def __init__(self, text):
+        self.text = text
+        self.sents = [StubSpan(part.strip() + ".") for part in text.split(".") if part.strip()]
+        self._tokens = [StubToken(word) for word in text.replace(".", " . ").split()]
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+class StubNLP:
+    """Stands in for a SpaCy pipeline with whitespace tokens and '.' sentence breaks."""
+    pipe_names = []
+
+    def __call__(self, text):
+        return StubDoc(text)
+
+    def make_doc(self, text):
+        return StubDoc(text)
+
+    def pipe(self, texts, **kwargs):
+        return (StubDoc(text) for text in texts)
+
+class StubRecognizer:
+    """Stands in for KaldiRecognizer: emits one word per second of audio it is fed."""
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self.emitted_until = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        self.samples += len(data) // 2
+        return self.samples // self.sample_rate > self.emitted_until
+
+    def _result(self):
+        seconds = self.samples // self.sample_rate
+        words = [{"word": "word", "start": float(t), "end": t + 0.5, "conf": 1.0} for t in range(self.emitted_until, seconds)]
+        self.emitted_until = seconds
+        return json.dumps({"text": " ".join(word["word"] for word in words), "result": words})
+
+    def Result(self):
+        return self._result()
+
+    def FinalResult(self):
+        return self._result()
+
+def install_stubs():
+    """Swaps every registered model for a lightweight stub so benchmarks run offline."""
+    register_model("yolo", StubYOLO)
+    register_model("emotion", lambda: StubDeepFace)
+    register_model("emotion_classifier", StubEmotionModel)
+    register_model("spacy", StubNLP)
+    register_model("vosk", lambda: "stub-vosk-model")
+    speech_processing.make_recognizer = StubRecognizer
@@ -1,5 +1,6 @@
 import os
 import shutil
+from workspace import JOBS_DIR, cleanup_stale_jobs
 
 # ✅ Define directories to clean
 CACHE_FILES = [
@@ -62,7 +63,19 @@ def clean_old_files():
 
     print("✅ Cleanup completed. Ready for new video processing!")
 
-# ✅ Run cleanup before processing starts
+def clean_all_jobs():
+    """Removes every per-job workspace. Only run this when no job is in progress."""
+    if os.path.exists(JOBS_DIR):
+        shutil.rmtree(JOBS_DIR)
+        print(f"🗑️ Deleted job workspaces: {JOBS_DIR}")
+
+# ✅ Manual maintenance: the app no longer runs this on every rerun, since it would wipe
+# ✅ files other sessions are still using. `--stale-jobs` only removes abandoned workspaces.
 if __name__ == "__main__":
-    ensure_directories()
-    clean_old_files()
+    import sys
+    if "--stale-jobs" in sys.argv:
+        cleanup_stale_jobs()
+    else:
+        ensure_directories()
+        clean_old_files()
+        clean_all_jobs()
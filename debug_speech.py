@@ -10,7 +10,7 @@ from vosk import Model, KaldiRecognizer
 UPLOAD_DIR = "uploads"
 DEBUG_DIR = "debug_outputs"
 MODEL_PATH = os.path.expanduser("~/vosk-model")  # ✅ Ensure this path is correct
-FFMPEG_PATH = "/opt/homebrew/bin/ffmpeg"  # ✅ Corrected FFmpeg path
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH") or shutil.which("ffmpeg") or "ffmpeg"  # ✅ Found on PATH
 
 # ✅ Ensure necessary directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -0,0 +1,110 @@
+import io
+import os
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+DEBUG_DIR = "debug_frames"
+DEBUG_FRAME_MODES = ("full", "thumbnail", "off")
+THUMBNAIL_WIDTH = 320
+JPEG_QUALITY = 90
+
+def annotate_frame(frame, object_text, emotion_text, scale=1.0):
+    """Draws the object and emotion labels on a frame; `scale` shrinks them for thumbnails."""
+    thickness = max(int(round(2 * scale)), 1)
+    cv2.putText(frame, f"Objects: {object_text}", (10, int(30 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 255, 0), thickness)
+    cv2.putText(frame, f"Emotion: {emotion_text}", (10, int(60 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 0, 0), thickness)
+    return frame
+
+class DebugFrameWriter:
+    """Annotates and JPEG-encodes debug frames on a background thread pool.
+
+    `mode` is `full`, `thumbnail` (downscaled to `thumbnail_width`) or `off`.
+    Only every `every_n`-th submitted frame is written. At most `max_pending`
+    frames wait in the queue; `submit` blocks beyond that so memory stays bounded.
+    """
+    def __init__(self, output_dir=DEBUG_DIR, mode="full", every_n=1, thumbnail_width=THUMBNAIL_WIDTH,
+                 workers=2, max_pending=16, jpeg_quality=JPEG_QUALITY):
+        if mode not in DEBUG_FRAME_MODES:
+            raise ValueError(f"Unknown debug frame mode: {mode}")
+
+        self.output_dir = output_dir
+        self.mode = mode
+        self.every_n = max(int(every_n), 1)
+        self.thumbnail_width = thumbnail_width
+        self.jpeg_quality = jpeg_quality
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(int(max_pending), 1))
+        self._executor = None
+
+        if self.mode != "off":
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="debug-writer")
+
+    def submit(self, frame, object_text, emotion_text, file_name):
+        """Queues one frame for writing and returns its future path, or None if it is skipped.
+
+        `frame` may also be a zero-argument callable; it is called on the writer
+        thread, e.g. to decode a full-resolution snapshot only for written frames.
+        """
+        index = self.submitted
+        self.submitted += 1
+        if self._executor is None or index % self.every_n != 0:
+            return None
+
+        frame_path = os.path.join(self.output_dir, file_name)
+        self._slots.acquire()  # ✅ Backpressure: wait for a free slot in the queue
+        try:
+            self._executor.submit(self._write, frame, object_text, emotion_text, frame_path)
+        except Exception:
+            self._slots.release()
+            raise
+        return frame_path
+
+    def _write(self, frame, object_text, emotion_text, frame_path):
+        try:
+            if callable(frame):
+                frame = frame()
+            scale = 1.0
+            if self.mode == "thumbnail" and frame.shape[1] > self.thumbnail_width:
+                scale = max(self.thumbnail_width / frame.shape[1], 0.4)
+                height = int(frame.shape[0] * self.thumbnail_width / frame.shape[1])
+                frame = cv2.resize(frame, (self.thumbnail_width, height), interpolation=cv2.INTER_AREA)
+
+            annotate_frame(frame, object_text, emotion_text, scale)
+            ok = cv2.imwrite(frame_path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+        except Exception as e:
+            print(f"❌ Error writing debug frame {frame_path}: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Waits for every queued frame to be written."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        """Returns how many frames were submitted, written and failed."""
+        return {"mode": self.mode, "submitted": self.submitted, "written": self.written, "failed": self.failed}
+
+def build_frames_zip(frame_dir=DEBUG_DIR):
+    """Returns ZIP bytes of every JPEG in `frame_dir`, stored without recompression."""
+    buffer = io.BytesIO()
+    # ✅ JPEGs are already compressed, so deflate would only cost time
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zipf:
+        for frame_file in sorted(os.listdir(frame_dir)):
+            if frame_file.lower().endswith((".jpg", ".jpeg")):
+                zipf.write(os.path.join(frame_dir, frame_file), arcname=frame_file)
+    return buffer.getvalue()
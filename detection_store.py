@@ -0,0 +1,237 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+STORE_FORMATS = ("parquet", "npy")
+STORE_VERSION = 1
+META_FILE = "meta.json"
+BOX_COLUMNS = ["x1", "y1", "x2", "y2"]
+TABLE_DTYPES = {
+    "frames": {"frame_time_sec": np.float64, "emotion_code": np.int16, "frame_image": np.str_, "reused": np.bool_},
+    "detections": {"frame_row": np.int32, "class_id": np.int16, "confidence": np.float32, "box": np.float32},
+    "faces": {"frame_row": np.int32, "emotion_code": np.int16, "score": np.float32, "box": np.float32}
+}
+
+def _empty_table(table):
+    return {
+        column: np.zeros((0, 4), dtype=dtype) if column == "box" else np.zeros(0, dtype=dtype)
+        for column, dtype in TABLE_DTYPES[table].items()
+    }
+
+class DetectionStore:
+    """Columnar per-video analysis results backed by NumPy arrays.
+
+    Three tables, each a dict of equal-length column arrays:
+
+    - `frames`: `frame_time_sec`, `emotion_code` (the frame's emotion text as an
+      index into `emotion_labels`), `frame_image` (debug JPEG name, or "") and
+      `reused` (results copied from a near-duplicate frame).
+    - `detections`: `frame_row` (index into `frames`), `class_id`, `confidence`
+      and an `(n, 4)` `box` of `[x1, y1, x2, y2]`; names are in `class_names`.
+    - `faces`: `frame_row`, `emotion_code`, `score` and `box`, one row per face
+      found by the emotion detection.
+
+    Stores are saved as Parquet or as `.npy` files that `load` memory-maps.
+    The display table of `process_video` is built from it on first use.
+    """
+    def __init__(self, frames, detections, faces, class_names, emotion_labels, frames_dir=None):
+        self.frames = frames
+        self.detections = detections
+        self.faces = faces
+        self.class_names = {int(class_id): name for class_id, name in class_names.items()}
+        self.emotion_labels = list(emotion_labels)
+        self.frames_dir = frames_dir
+        self._display = None
+
+    def __len__(self):
+        return len(self.frames["frame_time_sec"])
+
+    @classmethod
+    def from_rows(cls, rows, frames_dir=None):
+        """Builds a store from the pipeline's result rows (see `process_video.build_rows`)."""
+        class_names = {}
+        emotion_codes = {}
+        frames = {column: [] for column in TABLE_DTYPES["frames"]}
+        detections = {column: [] for column in TABLE_DTYPES["detections"]}
+        faces = {column: [] for column in TABLE_DTYPES["faces"]}
+
+        def emotion_code(text):
+            return emotion_codes.setdefault(text, len(emotion_codes))
+
+        for frame_row, row in enumerate(rows):
+            frames["frame_time_sec"].append(row["frame_time_sec"])
+            frames["emotion_code"].append(emotion_code(row["facial_emotion"]))
+            frames["frame_image"].append(os.path.basename(row["frame_image"]) if row.get("frame_image") else "")
+            frames["reused"].append(bool(row.get("reused", False)))
+
+            for detection in row.get("detections") or []:
+                class_names[detection["class_id"]] = detection["label"]
+                detections["frame_row"].append(frame_row)
+                detections["class_id"].append(detection["class_id"])
+                detections["confidence"].append(detection["confidence"])
+                detections["box"].append(detection["box"])
+
+            for face in row.get("faces") or []:
+                faces["frame_row"].append(frame_row)
+                faces["emotion_code"].append(emotion_code(face["emotion"]))
+                faces["score"].append(face["score"])
+                faces["box"].append(face["box"])
+
+        def to_arrays(table, columns):
+            arrays = _empty_table(table)
+            for column, values in columns.items():
+                if values:
+                    arrays[column] = np.asarray(values, dtype=TABLE_DTYPES[table][column])
+            return arrays
+
+        return cls(to_arrays("frames", frames), to_arrays("detections", detections), to_arrays("faces", faces),
+                   class_names, list(emotion_codes), frames_dir)
+
+    def _labels(self, class_ids):
+        lookup = np.array([self.class_names.get(class_id, str(class_id)) for class_id in range(max(self.class_names, default=-1) + 1)] or [""], dtype=object)
+        return lookup[class_ids]
+
+    def display_frame(self):
+        """Returns the `frame_time_sec`/`objects_detected`/`facial_emotion`/`frame_image`/`reused` table (memoized)."""
+        if self._display is None:
+            frame_count = len(self)
+            objects = pd.Series("None", index=range(frame_count), dtype=object)
+            if len(self.detections["frame_row"]):
+                labels = pd.Series(self._labels(self.detections["class_id"]), index=self.detections["frame_row"])
+                joined = labels.groupby(level=0, sort=True).agg(", ".join)
+                objects.loc[joined.index] = joined.values
+
+            emotion_labels = np.array(self.emotion_labels or [""], dtype=object)
+            images = np.asarray(self.frames["frame_image"], dtype=object)
+            if self.frames_dir:
+                frame_image = [os.path.join(self.frames_dir, name) if name else None for name in images]
+            else:
+                frame_image = [None] * frame_count
+
+            self._display = pd.DataFrame({
+                "frame_time_sec": np.asarray(self.frames["frame_time_sec"]),
+                "objects_detected": objects.values,
+                "facial_emotion": emotion_labels[np.asarray(self.frames["emotion_code"])],
+                "frame_image": frame_image,
+                "reused": np.asarray(self.frames["reused"], dtype=bool)
+            })
+        return self._display
+
+    def detections_frame(self):
+        """Returns one row per detection with its frame time, label, confidence and box."""
+        frame_rows = np.asarray(self.detections["frame_row"])
+        data = {
+            "frame_time_sec": np.asarray(self.frames["frame_time_sec"])[frame_rows],
+            "label": self._labels(self.detections["class_id"]),
+            "class_id": np.asarray(self.detections["class_id"]),
+            "confidence": np.asarray(self.detections["confidence"])
+        }
+        data.update(zip(BOX_COLUMNS, np.asarray(self.detections["box"]).reshape(-1, 4).T))
+        return pd.DataFrame(data)
+
+    def faces_frame(self):
+        """Returns one row per face with its frame time, emotion, score and box."""
+        frame_rows = np.asarray(self.faces["frame_row"])
+        emotion_labels = np.array(self.emotion_labels or [""], dtype=object)
+        data = {
+            "frame_time_sec": np.asarray(self.frames["frame_time_sec"])[frame_rows],
+            "emotion": emotion_labels[np.asarray(self.faces["emotion_code"])],
+            "score": np.asarray(self.faces["score"])
+        }
+        data.update(zip(BOX_COLUMNS, np.asarray(self.faces["box"]).reshape(-1, 4).T))
+        return pd.DataFrame(data)
+
+    def iter_rows(self):
+        """Yields the stored frames back as row dicts in the `process_video.build_rows` format."""
+        display = self.display_frame()
+        detection_rows = np.asarray(self.detections["frame_row"])
+        face_rows = np.asarray(self.faces["frame_row"])
+        labels = self._labels(self.detections["class_id"])
+        emotion_labels = self.emotion_labels
+
+        for frame_row, record in enumerate(display.to_dict("records")):
+            start, end = np.searchsorted(detection_rows, [frame_row, frame_row + 1])
+            record["detections"] = [
+                {"label": labels[i], "class_id": int(self.detections["class_id"][i]),
+                 "confidence": float(self.detections["confidence"][i]), "box": [float(v) for v in self.detections["box"][i]]}
+                for i in range(start, end)
+            ]
+            face_start, face_end = np.searchsorted(face_rows, [frame_row, frame_row + 1])
+            record["faces"] = [
+                {"emotion": emotion_labels[self.faces["emotion_code"][i]], "score": float(self.faces["score"][i]),
+                 "box": [float(v) for v in self.faces["box"][i]]}
+                for i in range(face_start, face_end)
+            ]  # ✅ Always a list: empty for frames without faces
+            yield record
+
+    def save(self, path, fmt="parquet"):
+        """Writes the store to directory `path` as Parquet tables or `.npy` arrays."""
+        if fmt not in STORE_FORMATS:
+            raise ValueError(f"Unknown store format: {fmt}")
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        # ✅ Write next to the target and rename, so readers never see half a store
+        staging = tempfile.mkdtemp(prefix=".store-", dir=parent)
+        try:
+            for table in TABLE_DTYPES:
+                columns = getattr(self, table)
+                if fmt == "parquet":
+                    data = {column: values for column, values in columns.items() if column != "box"}
+                    if "box" in columns:
+                        data.update(zip(BOX_COLUMNS, np.asarray(columns["box"]).reshape(-1, 4).T))
+                    pd.DataFrame(data).to_parquet(os.path.join(staging, f"{table}.parquet"), index=False)
+                else:
+                    for column, values in columns.items():
+                        np.save(os.path.join(staging, f"{table}.{column}.npy"), np.asarray(values))
+
+            meta = {
+                "version": STORE_VERSION,
+                "format": fmt,
+                "class_names": self.class_names,
+                "emotion_labels": self.emotion_labels,
+                "frames_dir": self.frames_dir
+            }
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True, frames_dir=None):
+        """Loads a saved store; `.npy` arrays are memory-mapped unless `mmap=False`.
+
+        `frames_dir` overrides the debug frame directory recorded at save time.
+        Columns added after a store was saved (e.g. `reused`) load as zeros.
+        """
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        tables = {}
+        for table, dtypes in TABLE_DTYPES.items():
+            if meta["format"] == "parquet":
+                df = pd.read_parquet(os.path.join(path, f"{table}.parquet"))
+                columns = {column: df[column].to_numpy(dtype=dtype) for column, dtype in dtypes.items() if column != "box" and column in df}
+                if "box" in dtypes:
+                    columns["box"] = df[BOX_COLUMNS].to_numpy(dtype=dtypes["box"]).reshape(-1, 4)
+                row_count = len(df)
+            else:
+                columns = {
+                    column: np.load(os.path.join(path, f"{table}.{column}.npy"), mmap_mode="r" if mmap else None)
+                    for column in dtypes if os.path.exists(os.path.join(path, f"{table}.{column}.npy"))
+                }
+                row_count = len(next(iter(columns.values()))) if columns else 0
+            for column, dtype in dtypes.items():
+                columns.setdefault(column, np.zeros(row_count, dtype=dtype))
+            tables[table] = columns
+
+        return cls(tables["frames"], tables["detections"], tables["faces"], meta["class_names"], meta["emotion_labels"],
+                   frames_dir if frames_dir is not None else meta.get("frames_dir"))
@@ -1,11 +1,51 @@
-from deepface import DeepFace
+import os
+import time
 from collections import Counter
+import cv2
+import numpy as np
+from model_registry import register_model, get_model
 
-def detect_emotion(frame):
-    """Detects dominant facial emotion in a video frame using DeepFace."""
+def build_emotion_model(DeepFace):
+    """Builds (or fetches from DeepFace's cache) the emotion model on old and new DeepFace versions."""
+    try:
+        return DeepFace.build_model(model_name="Emotion", task="facial_attribute")  # ✅ DeepFace >= 0.0.90
+    except TypeError:
+        return DeepFace.build_model("Emotion")  # ✅ Older DeepFace: no `task` argument
+
+def load_emotion_model():
+    """Imports DeepFace (and TensorFlow) and builds its emotion model once."""
+    from deepface import DeepFace
+    build_emotion_model(DeepFace)
+    return DeepFace
+
+# ✅ DeepFace keeps the built model in its own cache, so later analyze() calls reuse it
+register_model("emotion", load_emotion_model)
+
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]  # ✅ Output order of DeepFace's model
+EMOTION_INPUT_SIZE = (48, 48)
+EMOTION_BATCH_SIZE = 64  # ✅ Face crops per forward pass
+FACE_DETECTORS = ("opencv", "retinaface", "mtcnn", "ssd", "yunet")
+DEFAULT_FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "opencv")  # ✅ opencv is fast; retinaface finds small and turned faces
+
+def load_emotion_classifier():
+    """Returns DeepFace's Keras emotion model itself, for batched forward passes."""
+    model = build_emotion_model(get_model("emotion"))
+    return getattr(model, "model", model)  # ✅ Newer DeepFace wraps the Keras model in a client object
+
+register_model("emotion_classifier", load_emotion_classifier)
+
+def detect_emotion(frame, metrics=None):
+    """Detects dominant facial emotion in a video frame using DeepFace.
+
+    If `metrics` is given, the DeepFace call latency is recorded as `deepface_frame`.
+    """
     try:
         # ✅ Perform emotion analysis
+        DeepFace = get_model("emotion")
+        start = time.perf_counter()
         emotions = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
+        if metrics is not None:
+            metrics.observe("deepface_frame", time.perf_counter() - start)
 
         # ✅ Ensure valid results
         if isinstance(emotions, list) and len(emotions) > 0:
@@ -23,3 +63,142 @@ def detect_emotion(frame):
     except Exception as e:
         print(f"❌ Error in emotion detection: {e}")
         return "Error"
+
+CROP_MARGIN = 0.1  # ✅ Fraction of the person box added on each side before cropping
+FACE_IOU_THRESHOLD = 0.5  # ✅ Faces overlapping more than this across person crops are the same face
+
+def box_iou(box_a, box_b):
+    """Returns the intersection-over-union of two `[x1, y1, x2, y2]` boxes."""
+    inter_w = max(0.0, min(box_a[2], box_b[2]) - max(box_a[0], box_b[0]))
+    inter_h = max(0.0, min(box_a[3], box_b[3]) - max(box_a[1], box_b[1]))
+    intersection = inter_w * inter_h
+    union = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1]) + (box_b[2] - box_b[0]) * (box_b[3] - box_b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+def crop_box(frame, box, margin=CROP_MARGIN):
+    """Crops `box` plus a margin from the frame; returns `(crop, x_offset, y_offset)`."""
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = box
+    pad_x = (x2 - x1) * margin
+    pad_y = (y2 - y1) * margin
+    left, top = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+    right, bottom = min(int(x2 + pad_x), width), min(int(y2 + pad_y), height)
+    return frame[top:bottom, left:right], left, top
+
+def find_faces(frame, detector_backend=DEFAULT_FACE_DETECTOR):
+    """Returns the `[x1, y1, x2, y2]` boxes of the faces DeepFace's `detector_backend` finds in `frame`."""
+    DeepFace = get_model("emotion")
+    boxes = []
+    for face in DeepFace.extract_faces(frame, detector_backend=detector_backend, enforce_detection=False, align=False):
+        # ✅ With enforce_detection=False a faceless image comes back whole with confidence 0
+        if face.get('confidence', 1) == 0:
+            continue
+        area = face.get('facial_area', {})
+        x, y = area.get('x', 0), area.get('y', 0)
+        boxes.append([float(x), float(y), float(x + area.get('w', 0)), float(y + area.get('h', 0))])
+    return boxes
+
+def face_input(frame, box):
+    """Crops a face box into the 48x48 grayscale input of the emotion model (None if empty).
+
+    The crop is padded with black to a centred square first, as DeepFace's own
+    preprocessing does, so non-square faces are not stretched.
+    """
+    x1, y1, x2, y2 = (int(value) for value in box)
+    crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+    if crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    side = max(height, width)
+    top, left = (side - height) // 2, (side - width) // 2
+    gray = cv2.copyMakeBorder(gray, top, side - height - top, left, side - width - left, cv2.BORDER_CONSTANT, value=0)
+    return cv2.resize(gray, EMOTION_INPUT_SIZE)
+
+def classify_emotions(face_images, metrics=None):
+    """Scores face inputs from `face_input` with one forward pass per `EMOTION_BATCH_SIZE` faces.
+
+    Returns an `(emotion, score)` pair per face, the score in percent as in
+    `DeepFace.analyze`. If `metrics` is given, each pass is recorded as `emotion_batch`.
+    """
+    if not face_images:
+        return []
+
+    model = get_model("emotion_classifier")
+    batch = np.stack(face_images).astype(np.float32)[..., np.newaxis] / 255.0
+    probabilities = []
+    for start in range(0, len(batch), EMOTION_BATCH_SIZE):
+        chunk = batch[start:start + EMOTION_BATCH_SIZE]
+        call_start = time.perf_counter()
+        probabilities.append(np.asarray(model.predict_on_batch(chunk)))  # ✅ No per-call predict() setup
+        if metrics is not None:
+            metrics.observe("emotion_batch", time.perf_counter() - call_start)
+            metrics.count("emotion_faces", len(chunk))
+
+    probabilities = np.concatenate(probabilities)
+    best = probabilities.argmax(axis=1)
+    return [(EMOTION_LABELS[label], float(probabilities[row, label] * 100)) for row, label in enumerate(best)]
+
+def detect_emotions_batch(frames, person_boxes=None, detector_backend=DEFAULT_FACE_DETECTOR, metrics=None):
+    """Finds the faces in every frame, then scores all of them together with `classify_emotions`.
+
+    With `person_boxes` (one list per frame), faces are only searched inside the
+    person crops, so frames without people cost nothing. Returns one list of
+    faces per frame, in input order, each with the dominant `emotion`, its
+    `score` and the face `box` in frame coordinates; a frame whose face
+    detection failed gets None.
+    If `metrics` is given, each frame's face detection is recorded as `face_detection`.
+    """
+    results = [[] for _ in frames]
+    face_images, owners, face_boxes = [], [], []
+
+    for frame_row, frame in enumerate(frames):
+        start = time.perf_counter()
+        try:
+            if person_boxes is None:
+                found = find_faces(frame, detector_backend)
+            else:
+                found = []
+                for person_box in person_boxes[frame_row]:
+                    crop, x_offset, y_offset = crop_box(frame, person_box)
+                    if crop.size == 0:
+                        continue
+                    for x1, y1, x2, y2 in find_faces(crop, detector_backend):
+                        face_box = [x1 + x_offset, y1 + y_offset, x2 + x_offset, y2 + y_offset]
+                        # ✅ Overlapping person boxes can contain the same face
+                        if not any(box_iou(face_box, other) > FACE_IOU_THRESHOLD for other in found):
+                            found.append(face_box)
+        except Exception as e:
+            print(f"❌ Error in face detection: {e}")
+            results[frame_row] = None
+            continue
+        if metrics is not None and (person_boxes is None or person_boxes[frame_row]):
+            metrics.observe("face_detection", time.perf_counter() - start)
+
+        for face_box in found:
+            image = face_input(frame, face_box)
+            if image is not None:
+                face_images.append(image)
+                owners.append(frame_row)
+                face_boxes.append(face_box)
+
+    try:
+        scores = classify_emotions(face_images, metrics)
+    except Exception as e:
+        print(f"❌ Error in emotion detection: {e}")
+        return [None] * len(frames)
+
+    # ✅ Each crop remembers its frame, so results land back on their frame times
+    for frame_row, face_box, (emotion, score) in zip(owners, face_boxes, scores):
+        results[frame_row].append({"emotion": emotion, "score": score, "box": face_box})
+    return results
+
+def summarize_faces(faces, per_face=False):
+    """Summarises a frame's faces: the most common emotion, or every face's with `per_face`."""
+    if faces is None:
+        return "Error"
+    if not faces:
+        return "No face detected"
+    if per_face:
+        return ", ".join(face["emotion"] for face in faces)
+    return Counter(face["emotion"] for face in faces).most_common(1)[0][0]
@@ -0,0 +1,63 @@
+import os
+from collections import OrderedDict
+import cv2
+
+HASH_SIZE = 8  # ✅ 8x8 difference hash: 64 bits
+DEFAULT_MEMO_SIZE = 16  # ✅ Recent distinct frames remembered
+# ✅ Unset: memoization off; e.g. 4 reuses results for frames at most 4 of 64 hash bits apart
+DEFAULT_MEMO_DISTANCE = int(os.environ["FRAME_MEMO_DISTANCE"]) if os.environ.get("FRAME_MEMO_DISTANCE") else None
+
+def frame_hash(frame, hash_size=HASH_SIZE):
+    """Returns the difference hash (dHash) of a BGR frame as an int of `hash_size ** 2` bits."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def hamming_distance(a, b):
+    """Returns the number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+class FrameMemo:
+    """Remembers the results of recently analysed frames by perceptual hash.
+
+    `lookup(frame)` returns `(entry, reused)`. A frame whose hash is within
+    `max_distance` bits of one of the last `capacity` distinct frames gets that
+    frame's entry (`reused=True`); otherwise it gets a new entry that the
+    pipeline stages fill with its `detections` and `faces`. Entries keep the
+    hash of the frame that created them, so a slow drift eventually misses.
+
+    Lookups and hits are counted in `metrics` as `memo_lookups`/`memo_hits`.
+    """
+    def __init__(self, max_distance=4, capacity=DEFAULT_MEMO_SIZE, metrics=None):
+        self.max_distance = int(max_distance)
+        self.capacity = max(int(capacity), 1)
+        self.metrics = metrics
+        self.entries = OrderedDict()  # ✅ hash -> entry, least recently used first
+
+    def lookup(self, frame, frame_index=None):
+        frame_key = frame_hash(frame)
+        match = min(self.entries, key=lambda key: hamming_distance(key, frame_key), default=None)
+        reused = match is not None and hamming_distance(match, frame_key) <= self.max_distance
+
+        if reused:
+            entry = self.entries[match]
+            self.entries.move_to_end(match)
+        else:
+            entry = {"frame_index": frame_index, "detections": None, "faces": None}
+            self.entries[frame_key] = entry
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+        if self.metrics is not None:
+            self.metrics.count("memo_lookups")
+            if reused:
+                self.metrics.count("memo_hits")
+        return entry, reused
+
+def record_hit_rate(metrics):
+    """Sets the `memo_hit_rate` gauge from the `memo_lookups`/`memo_hits` counters; returns the rate."""
+    lookups = metrics.counters.get("memo_lookups", 0)
+    hit_rate = round(metrics.counters.get("memo_hits", 0) / lookups, 4) if lookups else 0.0
+    metrics.gauge("memo_hit_rate", hit_rate)
+    return hit_rate
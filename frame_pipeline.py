@@ -0,0 +1,182 @@
+import time
+import queue
+import threading
+from contextlib import nullcontext
+
+PIPELINE_QUEUE_SIZE = 2  # ✅ Items (frame batches) waiting between two stages
+POLL_INTERVAL_SEC = 0.1
+_DONE = object()
+
+class BoundedPipeline:
+    """Runs items from a source iterator through stages on threads joined by bounded queues.
+
+    The source is iterated on its own thread (e.g. the video decode), reported
+    as `source_name`. Each stage is `(name, func, workers)`, and `func(item)`
+    returns the item handed to the next stage. `run()` yields the last stage's
+    items in source order on the calling thread, which acts as the sink.
+
+    Every queue holds at most `queue_size` items. A slow stage therefore blocks
+    the ones before it (backpressure), and the number of items in flight, and so
+    memory, stays fixed however long the source is. Stages overlap wherever
+    their work releases the GIL (decoding, OpenCV, torch, TensorFlow, ONNX Runtime).
+
+    With `metrics` (a `PipelineMetrics`), each queue's mean and max depth and
+    each stage's utilisation are set as gauges when the run ends. Utilisation is
+    busy time divided by wall time times workers. When its profiling is enabled,
+    each thread runs under its own cProfile profiler, merged per stage name.
+    """
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE, metrics=None, source_name="source"):
+        self.stages = [(name, func, max(int(workers), 1)) for name, func, workers in stages]
+        self.source_name = source_name
+        self.queue_size = max(int(queue_size), 1)
+        self.metrics = metrics
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._errors = []
+        self._busy = {}
+        self._depth = {}
+
+    def _record_depth(self, name, depth):
+        with self._lock:
+            total, samples, peak = self._depth.get(name, (0, 0, 0))
+            self._depth[name] = (total + depth, samples + 1, max(peak, depth))
+
+    def _add_busy(self, name, seconds):
+        with self._lock:
+            self._busy[name] = self._busy.get(name, 0.0) + seconds
+
+    def _fail(self, error):
+        with self._lock:
+            self._errors.append(error)
+        self._stop.set()  # ✅ Unblocks every other thread waiting on a queue
+
+    def _put(self, items, name, item):
+        """Puts `item` on queue `items`, waiting while it is full; False if the pipeline stopped."""
+        while not self._stop.is_set():
+            try:
+                items.put(item, timeout=POLL_INTERVAL_SEC)
+            except queue.Full:
+                continue
+            if item is not _DONE:
+                self._record_depth(name, items.qsize())
+            return True
+        return False
+
+    def _get(self, items):
+        """Takes the next item from queue `items`, or `_DONE` once the pipeline stopped."""
+        while not self._stop.is_set():
+            try:
+                return items.get(timeout=POLL_INTERVAL_SEC)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _profiling(self, name):
+        return self.metrics.profiling(name) if self.metrics is not None else nullcontext()
+
+    def _produce(self, source, output, output_name):
+        with self._profiling(self.source_name):
+            self._produce_items(source, output, output_name)
+
+    def _produce_items(self, source, output, output_name):
+        busy = 0.0
+        try:
+            iterator = iter(source)
+            sequence = 0
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                busy += time.perf_counter() - start
+                if item is _DONE or not self._put(output, output_name, (sequence, item)):
+                    break
+                sequence += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._add_busy(self.source_name, busy)
+            self._put(output, output_name, _DONE)
+
+    def _work(self, index, inputs, output, output_name, remaining):
+        with self._profiling(self.stages[index][0]):
+            self._work_items(index, inputs, output, output_name, remaining)
+
+    def _work_items(self, index, inputs, output, output_name, remaining):
+        name, func, _ = self.stages[index]
+        busy = 0.0
+        try:
+            while True:
+                item = self._get(inputs)
+                if item is _DONE:
+                    inputs.put_nowait(_DONE)  # ✅ Pass the end marker on to this stage's other workers
+                    break
+                sequence, value = item
+                start = time.perf_counter()
+                value = func(value)
+                busy += time.perf_counter() - start
+                if not self._put(output, output_name, (sequence, value)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._add_busy(name, busy)
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                self._put(output, output_name, _DONE)  # ✅ The stage's last worker ends the next stage
+
+    def run(self, source):
+        """Starts the threads and yields the processed items in source order.
+
+        Closing the generator early stops every stage after its current item.
+        An exception raised in any stage stops the run and is re-raised here.
+        """
+        queue_names = [name for name, _, _ in self.stages] + ["sink"]  # ✅ Each queue is named by its consumer
+        queues = [queue.Queue(self.queue_size) for _ in queue_names]
+        remaining = [workers for _, _, workers in self.stages]
+
+        threads = [threading.Thread(target=self._produce, args=(source, queues[0], queue_names[0]),
+                                    name=f"pipeline-{self.source_name}", daemon=True)]
+        for index, (name, _, workers) in enumerate(self.stages):
+            for worker in range(workers):
+                threads.append(threading.Thread(target=self._work, name=f"pipeline-{name}-{worker}", daemon=True,
+                                                args=(index, queues[index], queues[index + 1], queue_names[index + 1], remaining)))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        pending = {}  # ✅ Reorders items that workers of one stage finished out of order
+        next_sequence = 0
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _DONE:
+                    break
+                sequence, value = item
+                pending[sequence] = value
+                while next_sequence in pending:
+                    yield pending.pop(next_sequence)
+                    next_sequence += 1
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._report(time.perf_counter() - start)
+
+        if self._errors:
+            raise self._errors[0]
+
+    def _report(self, wall_sec):
+        if self.metrics is None:
+            return
+        with self._lock:
+            depths = dict(self._depth)
+            busy = dict(self._busy)
+        for name, (total, samples, peak) in depths.items():
+            self.metrics.gauge("queue_depth_mean", round(total / samples, 3) if samples else 0.0, queue=name)
+            self.metrics.gauge("queue_depth_max", peak, queue=name)
+        workers = {self.source_name: 1, **{name: count for name, _, count in self.stages}}
+        for name, seconds in busy.items():
+            utilisation = seconds / (wall_sec * workers[name]) if wall_sec > 0 else 0.0
+            self.metrics.gauge("stage_utilisation", round(utilisation, 3), stage=name)
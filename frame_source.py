@@ -0,0 +1,337 @@
+import os
+import math
+import shutil
+import subprocess
+from fractions import Fraction
+import cv2
+import numpy as np
+
+DEFAULT_SAMPLE_INTERVAL_SEC = 0.5
+SAMPLING_MODES = ("grab", "seek", "keyframe")
+DECODERS = ("opencv", "ffmpeg")
+DEFAULT_DECODE_WIDTH = 1280  # ✅ Enough for YOLO's 640 input and for small faces
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH") or shutil.which("ffmpeg")
+
+
+class FrameSource:
+    """Decodes a video once and shares every frame with the registered consumers.
+
+    `start_frame`/`end_frame` (exclusive) restrict decoding to one segment of
+    the video; frame indices and times stay those of the whole video. In `grab`
+    sampling, consumers keep receiving `lookahead_frames` frames past the end
+    (e.g. so a scene cut right at the segment edge is still seen).
+    """
+
+    def __init__(self, video_path, start_frame=0, end_frame=None, lookahead_frames=0):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.start_frame = max(int(start_frame), 0)
+        self.end_frame = end_frame
+        self.lookahead_frames = max(int(lookahead_frames), 0)
+        self.consumers = []
+        self.frames_grabbed = 0  # ✅ Frames advanced past with grab() only
+        self.frames_decoded = 0  # ✅ Frames converted to BGR images
+        if self.start_frame and self.cap.isOpened():
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)  # ✅ Exact when the segment starts on a keyframe
+
+    def in_range(self, frame_index):
+        """Returns True if `frame_index` lies before `end_frame`."""
+        return self.end_frame is None or frame_index < self.end_frame
+
+    def is_opened(self):
+        """Returns True if the underlying capture could be opened."""
+        return self.cap.isOpened()
+
+    def add_consumer(self, consumer):
+        """Registers an object with a `process_frame(frame_index, frame)` method.
+
+        In `grab` sampling a consumer with a `frame_stride` attribute of n is only
+        fed every n-th frame, so the other frames need not be decoded to BGR.
+        """
+        self.consumers.append(consumer)
+
+    def frame_time(self, frame_index):
+        """Returns the exact timestamp in seconds of `frame_index`."""
+        if self.fps > 0:
+            return frame_index / self.fps  # ✅ Float division keeps 29.97 fps exact
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def frames(self):
+        """Yields `(frame_index, frame)` for every decoded frame after feeding the consumers."""
+        frame_index = self.start_frame
+        while self.cap.isOpened() and self.in_range(frame_index):
+            ret, frame = self.cap.read()
+            if not ret:
+                break  # ✅ End of stream
+            self.frames_decoded += 1
+
+            # ✅ Consumers see the untouched frame before the caller draws on it
+            self._emit(frame_index, frame)
+
+            yield frame_index, frame
+            frame_index += 1
+
+    def sample(self, interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, mode="grab"):
+        """Yields `(frame_index, frame_time_sec, frame)` roughly every `interval_sec` seconds.
+
+        `grab` walks the stream with `grab()` and only retrieves the frames it
+        needs (every frame if a consumer is registered). `seek` jumps to each
+        target frame. `keyframe` seeks to keyframes only, for very long videos;
+        consumers then only see the frames that were decoded.
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+
+        interval_sec = max(float(interval_sec), 1e-3)
+
+        if mode == "keyframe":
+            keyframe_times = self.keyframe_times()
+            if keyframe_times:
+                yield from self._sample_keyframes(keyframe_times, interval_sec)
+                return
+            print("⚠️ Keyframe timestamps unavailable. Falling back to seek sampling.")
+            mode = "seek"
+
+        if mode == "seek" and self.fps > 0 and self.total_frames > 0:
+            yield from self._sample_seek(interval_sec)
+        else:
+            yield from self._sample_grab(interval_sec)
+
+    def _emit(self, frame_index, frame):
+        for consumer in self.consumers:
+            consumer.process_frame(frame_index, frame)
+
+    def _sample_grab(self, interval_sec):
+        frame_index = self.start_frame
+        next_sample_time = 0.0
+        if frame_index > 0:
+            # ✅ Resume the grid a pass over the whole video would have after the previous frame
+            next_sample_time = (math.floor(self.frame_time(frame_index - 1) / interval_sec + 1e-9) + 1) * interval_sec
+        scan_end = None
+        if self.end_frame is not None:
+            scan_end = self.end_frame + (self.lookahead_frames if self.consumers else 0)
+
+        while (scan_end is None or frame_index < scan_end) and self.cap.grab():
+            frame_time = self.frame_time(frame_index)
+            wanted = frame_time >= next_sample_time - 1e-9 and self.in_range(frame_index)
+            consumers = [consumer for consumer in self.consumers if frame_index % getattr(consumer, "frame_stride", 1) == 0]
+
+            # ✅ Skip the decode-to-BGR step for frames nobody needs
+            if wanted or consumers:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                self.frames_decoded += 1
+                for consumer in consumers:
+                    consumer.process_frame(frame_index, frame)
+
+                if wanted:
+                    yield frame_index, frame_time, frame
+                    next_sample_time = (math.floor(frame_time / interval_sec + 1e-9) + 1) * interval_sec
+            else:
+                self.frames_grabbed += 1
+
+            frame_index += 1
+
+    def _sample_seek(self, interval_sec):
+        sample_count = int(self.total_frames / self.fps / interval_sec) + 1
+        targets = sorted({round(k * interval_sec * self.fps) for k in range(sample_count)})
+        targets = [target for target in targets if target >= self.start_frame]
+        position = self.start_frame
+
+        for target in targets:
+            if target >= self.total_frames or not self.in_range(target):
+                break
+
+            # ✅ Grabbing forward is cheaper than a seek for nearby targets
+            if 0 <= target - position < self.fps:
+                while position < target and self.cap.grab():
+                    position += 1
+                    self.frames_grabbed += 1
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            position += 1
+            self.frames_decoded += 1
+
+            self._emit(target, frame)
+            yield target, self.frame_time(target), frame
+
+    def _sample_keyframes(self, keyframe_times, interval_sec):
+        last_time = None
+
+        start_time = self.frame_time(self.start_frame)
+        for keyframe_time in keyframe_times:
+            if keyframe_time < start_time - 1e-9 or (last_time is not None and keyframe_time - last_time < interval_sec):
+                continue
+            if self.fps > 0 and not self.in_range(round(keyframe_time * self.fps)):
+                break
+
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, keyframe_time * 1000.0)
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_decoded += 1
+
+            frame_index = round(keyframe_time * self.fps) if self.fps > 0 else 0
+            last_time = keyframe_time
+
+            self._emit(frame_index, frame)
+            yield frame_index, keyframe_time, frame
+
+    def keyframe_times(self):
+        """Returns the sorted keyframe timestamps (seconds) reported by ffprobe, or None."""
+        ffprobe_path = shutil.which("ffprobe")
+        if not ffprobe_path:
+            return None
+
+        command = [
+            ffprobe_path, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", self.video_path
+        ]
+        try:
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        except Exception as e:
+            print(f"❌ Error reading keyframes: {e}")
+            return None
+
+        keyframe_times = []
+        for line in output.splitlines():
+            parts = line.strip().split(",")
+            if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+                keyframe_times.append(float(parts[0]))
+
+        return sorted(keyframe_times) or None
+
+    def release(self):
+        """Releases the underlying capture."""
+        self.cap.release()
+
+
+class FFmpegFrameSource(FrameSource):
+    """Decodes through an FFmpeg rawvideo pipe, scaling (and sampling) inside the decoder.
+
+    Frames are BGR arrays at most `decode_width` pixels wide, wrapped around
+    their pipe buffers with `np.frombuffer` (no copy). `sample()` puts
+    `fps=1/interval_sec` in the FFmpeg filter graph, so skipped frames never
+    reach Python and consumers only see the sampled frames. `full_frame()`
+    decodes a single full-resolution frame with OpenCV on demand, e.g. for
+    debug snapshots. `width`/`height` are the decoded (scaled) size.
+    A `start_frame`/`end_frame` range is passed to FFmpeg as an input seek and
+    duration; `lookahead_frames` is not supported here.
+    """
+
+    def __init__(self, video_path, decode_width=DEFAULT_DECODE_WIDTH, start_frame=0, end_frame=None):
+        super().__init__(video_path, start_frame, end_frame)
+        self.source_width, self.source_height = self.width, self.height
+        self.opened = self.cap.isOpened() and FFMPEG_PATH is not None and self.source_width > 0
+        self.cap.release()  # ✅ OpenCV is only used to probe the stream
+        self.process = None
+
+        if self.opened and decode_width and decode_width < self.source_width:
+            self.width = int(decode_width) - int(decode_width) % 2
+            self.height = max(int(round(self.source_height * self.width / self.source_width / 2)) * 2, 2)
+
+    def is_opened(self):
+        """Returns True if the video could be probed and FFmpeg is available."""
+        return self.opened
+
+    def _read_frames(self, filters, start_sec=0.0):
+        """Yields BGR frames from FFmpeg with the given video filters applied, from `start_sec` to `end_frame`."""
+        if self.width != self.source_width:
+            filters = filters + [f"scale={self.width}:{self.height}:flags=area"]
+        command = [FFMPEG_PATH, "-nostdin", "-loglevel", "error"]
+        if start_sec > 0:
+            command += ["-ss", f"{start_sec:.6f}"]
+        if self.end_frame is not None and self.fps > 0:
+            command += ["-t", f"{max(self.end_frame / self.fps - start_sec, 0.0):.6f}"]
+        command += ["-i", self.video_path, "-an", "-sn"]
+        if filters:
+            command += ["-vf", ",".join(filters)]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+        frame_bytes = self.width * self.height * 3
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                # ✅ A fresh buffer per frame: frames are batched and handed to other threads
+                buffer = bytearray(frame_bytes)
+                view = memoryview(buffer)
+                filled = 0
+                while filled < frame_bytes:
+                    read = self.process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                if filled < frame_bytes:
+                    break  # ✅ End of stream
+                self.frames_decoded += 1
+                yield np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+        finally:
+            self.release()
+
+    def frames(self):
+        """Yields `(frame_index, frame)` for every (scaled) frame after feeding the consumers."""
+        for frame_index, frame in enumerate(self._read_frames([], self.frame_time(self.start_frame)), self.start_frame):
+            if not self.in_range(frame_index):
+                break
+            self._emit(frame_index, frame)
+            yield frame_index, frame
+
+    def sample(self, interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, mode="grab"):
+        """Yields `(frame_index, frame_time_sec, frame)` every `interval_sec` seconds.
+
+        Sampling happens in FFmpeg's `fps` filter, so `mode` is ignored.
+        `frame_index` is the nearest frame of the source stream.
+        """
+        interval_sec = max(float(interval_sec), 1e-3)
+        output_fps = Fraction(1 / interval_sec).limit_denominator(1000)
+        first_sample = math.ceil(self.frame_time(self.start_frame) / interval_sec - 1e-9)  # ✅ Global sampling grid
+
+        frames = self._read_frames([f"fps={output_fps.numerator}/{output_fps.denominator}"], first_sample * interval_sec)
+        for sample_index, frame in enumerate(frames, first_sample):
+            frame_time = sample_index * interval_sec
+            frame_index = round(frame_time * self.fps) if self.fps > 0 else sample_index
+            if not self.in_range(frame_index):
+                break
+            self._emit(frame_index, frame)
+            yield frame_index, frame_time, frame
+
+    def full_frame(self, frame_index, fallback=None):
+        """Decodes one full-resolution frame with OpenCV, or returns `fallback` on failure."""
+        cap = cv2.VideoCapture(self.video_path)  # ✅ Own capture: called from debug writer threads
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            return frame if ret else fallback
+        finally:
+            cap.release()
+
+    def release(self):
+        """Stops the FFmpeg process, if one is running."""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()  # ✅ Consumer stopped early
+        self.process.wait()
+        self.process.stdout.close()
+        self.process = None
+
+def open_frame_source(video_path, decoder="opencv", decode_width=DEFAULT_DECODE_WIDTH,
+                      start_frame=0, end_frame=None, lookahead_frames=0):
+    """Returns a `FrameSource` (`opencv`) or an `FFmpegFrameSource` (`ffmpeg`), optionally limited to a frame range."""
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder}")
+    if decoder == "ffmpeg":
+        if FFMPEG_PATH:
+            return FFmpegFrameSource(video_path, decode_width, start_frame, end_frame)
+        print("⚠️ FFmpeg not found. Falling back to OpenCV decoding.")
+    return FrameSource(video_path, start_frame, end_frame, lookahead_frames)
@@ -0,0 +1,252 @@
+import os
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+from model_registry import current_rss_bytes
+
+PERCENTILES = (50, 90, 99)
+RSS_SAMPLE_INTERVAL_SEC = 0.2
+METRIC_PREFIX = "video_pipeline"
+
+class PipelineMetrics:
+    """Thread-safe metrics for one pipeline run.
+
+    Records wall and CPU time per stage, named counters (e.g. frames decoded vs
+    analysed), labelled gauges (e.g. queue depths), latency samples per operation
+    and the peak RSS seen while the background sampler runs. CPU time is the calling thread's own time, so work
+    done in FFmpeg, ASR worker processes or native thread pools is not included;
+    `process_cpu_sec` in `to_dict()` covers the whole process and its children.
+    If `profile_dir` is set, `profiling()` runs blocks under cProfile and dumps
+    one `.prof` file per name there, merged across the threads that ran it.
+    """
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.latencies = {}
+        self.profiles = {}
+        self._profile_stats = {}
+        self.peak_rss_bytes = current_rss_bytes()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_wall = time.perf_counter()
+        self._started_cpu = self._process_cpu()
+
+    @staticmethod
+    def _process_cpu():
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block (wall and thread CPU) and adds it to stage `name`."""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+    def add_stage_time(self, name, wall_sec, cpu_sec=0.0):
+        """Adds one timed call to stage `name`."""
+        with self._lock:
+            stage = self.stages.setdefault(name, {"wall_sec": 0.0, "cpu_sec": 0.0, "calls": 0})
+            stage["wall_sec"] += wall_sec
+            stage["cpu_sec"] += cpu_sec
+            stage["calls"] += 1
+
+    def count(self, name, value=1):
+        """Adds `value` to counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value, **labels):
+        """Sets gauge `name` with the given labels to `value`."""
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds):
+        """Records one latency sample for operation `name`."""
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def profiling(self, name):
+        """Runs the enclosed block under a cProfile profiler of this thread when profiling is enabled.
+
+        cProfile only sees the thread that enabled it, so every worker thread of
+        a stage profiles itself under the stage's `name`; the stats are merged
+        with `pstats.Stats.add` into one `profile_<name>.prof`. Python 3.12+ allows
+        one active profiler per process, so there a block that starts while
+        another is profiled runs unprofiled and counts as `profiles_skipped`.
+        """
+        if not self.profile_dir:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            print(f"⚠️ Profiler busy; running {name} without profiling")
+            self.count("profiles_skipped")
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._add_profile(name, profiler)
+
+    def _add_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        profile_path = os.path.join(self.profile_dir, f"profile_{name}.prof")
+        with self._lock:
+            stats = self._profile_stats.get(name)
+            if stats is None:
+                stats = self._profile_stats[name] = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+            stats.dump_stats(profile_path)
+            self.profiles[name] = profile_path
+
+    def profiled(self, name, func):
+        """Returns `func` wrapped in `profiling(name)` when profiling is enabled, else `func` itself."""
+        if not self.profile_dir:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with self.profiling(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def start(self):
+        """Starts the background peak-RSS sampler."""
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        """Stops the peak-RSS sampler and takes a last reading."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self._update_peak_rss()
+
+    def _update_peak_rss(self):
+        rss = current_rss_bytes()
+        with self._lock:
+            self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL_SEC):
+            self._update_peak_rss()
+
+    def snapshot(self):
+        """Returns the raw stage times, counters, gauges and latency samples, e.g. to send from a worker process."""
+        with self._lock:
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "latencies": {name: list(samples) for name, samples in self.latencies.items()}
+            }
+
+    def merge(self, snapshot, **labels):
+        """Adds a `snapshot()` from another run (e.g. a worker process) to these metrics.
+
+        Stage times, counters and latency samples accumulate; its gauges are set
+        with `labels` added, so gauges of different workers stay apart.
+        """
+        with self._lock:
+            for name, stage in snapshot["stages"].items():
+                total = self.stages.setdefault(name, {"wall_sec": 0.0, "cpu_sec": 0.0, "calls": 0})
+                for key in total:
+                    total[key] += stage[key]
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for (name, gauge_labels), value in snapshot["gauges"].items():
+                self.gauges[(name, tuple(sorted({**dict(gauge_labels), **labels}.items())))] = value
+            for name, samples in snapshot["latencies"].items():
+                self.latencies.setdefault(name, []).extend(samples)
+
+    def to_dict(self):
+        """Returns every metric as a JSON-serialisable dict."""
+        with self._lock:
+            stages = {
+                name: {"wall_sec": round(stage["wall_sec"], 4), "cpu_sec": round(stage["cpu_sec"], 4), "calls": stage["calls"]}
+                for name, stage in self.stages.items()
+            }
+            latencies = {name: latency_summary(samples) for name, samples in self.latencies.items()}
+            return {
+                "wall_sec": round(time.perf_counter() - self._started_wall, 4),
+                "process_cpu_sec": round(self._process_cpu() - self._started_cpu, 4),
+                "peak_rss_mb": round(self.peak_rss_bytes / (1024 * 1024), 1),
+                "stages": stages,
+                "counters": dict(self.counters),
+                "gauges": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.gauges.items()],
+                "latency": latencies,
+                "profiles": dict(self.profiles)
+            }
+
+def latency_summary(samples):
+    """Returns count, mean and percentiles (in milliseconds) of latency samples in seconds."""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {"count": int(values.size), "sum_ms": round(float(values.sum()), 3)}
+    if values.size:
+        summary["mean_ms"] = round(float(values.mean()), 3)
+        for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            summary[f"p{percentile}_ms"] = round(float(value), 3)
+    return summary
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for key, value in labels.items()}
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+def format_prometheus(metrics, labels=None, prefix=METRIC_PREFIX):
+    """Renders a `PipelineMetrics.to_dict()` result in the Prometheus text exposition format."""
+    labels = dict(labels or {})
+    lines = []
+
+    def metric(name, metric_type, samples, help_text):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        for suffix, extra, value in samples:
+            lines.append(f"{prefix}_{name}{suffix}{_labels({**labels, **extra})} {value}")
+
+    metric("wall_seconds", "gauge", [("", {}, metrics["wall_sec"])], "Wall-clock time of the whole run.")
+    metric("process_cpu_seconds", "gauge", [("", {}, metrics["process_cpu_sec"])], "CPU time of the process and its children.")
+    metric("peak_rss_bytes", "gauge", [("", {}, int(metrics["peak_rss_mb"] * 1024 * 1024))], "Peak resident memory during the run.")
+    metric("stage_wall_seconds", "gauge",
+           [("", {"stage": name}, stage["wall_sec"]) for name, stage in metrics["stages"].items()], "Wall-clock time per stage.")
+    metric("stage_cpu_seconds", "gauge",
+           [("", {"stage": name}, stage["cpu_sec"]) for name, stage in metrics["stages"].items()], "Thread CPU time per stage.")
+    metric("events_total", "counter",
+           [("", {"name": name}, value) for name, value in metrics["counters"].items()], "Counted events such as frames decoded.")
+
+    gauge_samples = {}
+    for gauge in metrics.get("gauges", []):
+        gauge_samples.setdefault(gauge["name"], []).append(("", gauge["labels"], gauge["value"]))
+    for name, samples in gauge_samples.items():
+        metric(name, "gauge", samples, "Pipeline gauge, e.g. queue depth or stage utilisation.")
+
+    latency_samples = []
+    for name, summary in metrics["latency"].items():
+        for percentile in PERCENTILES:
+            if f"p{percentile}_ms" in summary:
+                latency_samples.append(("", {"op": name, "quantile": percentile / 100}, summary[f"p{percentile}_ms"] / 1000.0))
+        latency_samples.append(("_sum", {"op": name}, summary["sum_ms"] / 1000.0))
+        latency_samples.append(("_count", {"op": name}, summary["count"]))
+    metric("latency_seconds", "summary", latency_samples, "Inference latency per operation.")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import threading
+
+# ✅ Process-wide state: shared by every Streamlit session and worker thread in this process
+_loaders = {}
+_models = {}
+_stats = {}
+_locks = {}
+_inference_locks = {}
+_registry_lock = threading.Lock()
+
+def current_rss_bytes():
+    """Returns the resident set size of this process in bytes (best effort)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024  # ✅ macOS reports bytes, Linux KB
+    except ImportError:
+        return 0
+
+def register_model(name, loader):
+    """Registers a zero-argument `loader` that builds the model called `name`.
+
+    Registering a different loader under an existing name (e.g. a benchmark stub)
+    drops the model already loaded from the old one.
+    """
+    with _registry_lock:
+        if _loaders.get(name) is not loader:
+            _models.pop(name, None)
+            _stats.pop(name, None)
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+def get_model(name):
+    """Returns the model called `name`, loading it on first use only."""
+    if name in _models:
+        return _models[name]
+
+    if name not in _loaders:
+        raise KeyError(f"No model registered under '{name}'")
+
+    with _locks[name]:
+        if name not in _models:  # ✅ Another thread may have loaded it while we waited
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            model = _loaders[name]()
+            load_time = time.perf_counter() - start
+            rss_delta_mb = (current_rss_bytes() - rss_before) / (1024 * 1024)
+
+            _stats[name] = {"load_time_sec": round(load_time, 3), "rss_delta_mb": round(rss_delta_mb, 1)}
+            _models[name] = model
+            print(f"✅ Loaded model '{name}' in {load_time:.2f}s (+{rss_delta_mb:.1f} MB RSS)")
+
+    return _models[name]
+
+def inference_lock(name):
+    """Returns the lock that serialises calls into the shared model `name` (not held while loading).
+
+    Models whose predict state is not thread-safe (e.g. an ultralytics `YOLO`)
+    are called under it, since every session and pipeline thread shares them.
+    """
+    with _registry_lock:
+        return _inference_locks.setdefault(name, threading.Lock())
+
+def is_loaded(name):
+    """Returns True if the model has already been loaded in this process."""
+    return name in _models
+
+def warm_up(names=None):
+    """Loads the given (default: all registered) models up front, e.g. at server start.
+
+    Failures are reported and skipped so one missing model does not block the others.
+    """
+    for name in names or list(_loaders):
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"❌ Failed to warm up model '{name}': {e}")
+    return model_stats()
+
+def model_stats():
+    """Returns load time and RSS growth per model; RSS deltas are approximate under concurrent loads."""
+    return {
+        name: dict(_stats.get(name, {}), loaded=name in _models)
+        for name in _loaders
+    }
@@ -1,18 +1,125 @@
-from ultralytics import YOLO
+import os
+import time
+from functools import partial
+from contextlib import nullcontext
+from model_registry import register_model, get_model, inference_lock
+from yolo_backends import (YOLO_BACKENDS, DEFAULT_IMGSZ, build_calibration_set, calibration_images,
+                           default_calibration_dir, export_model, load_exported)
 
-# ✅ Load YOLO model
-yolo_model = YOLO("yolov8n.pt")
+YOLO_WEIGHTS = "yolov8n.pt"
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "pytorch")  # ✅ pytorch, onnx or openvino
+YOLO_IMGSZ = int(os.environ.get("YOLO_IMGSZ", DEFAULT_IMGSZ))
+YOLO_THREADS = int(os.environ.get("YOLO_THREADS", "0"))  # ✅ 0 = the runtime's default
+YOLO_INT8 = os.environ.get("YOLO_INT8", "0") == "1"
+
+# ✅ The settings the registered "yolo" loader uses; part of the video cache key
+_yolo_settings = {"backend": YOLO_BACKEND, "imgsz": YOLO_IMGSZ, "threads": YOLO_THREADS, "int8": YOLO_INT8 and YOLO_BACKEND != "pytorch",
+                  "calibration_dir": None}
+
+def export_yolo(backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, int8=YOLO_INT8, calibration_dir=None, calibration_videos=None):
+    """Exports YOLOv8 to `backend` once (cached next to the weights) and returns the artifact path.
+
+    For INT8, calibration frames are sampled from `calibration_videos` into
+    `calibration_dir` unless that directory already holds some.
+    """
+    calibration_dir = calibration_dir or default_calibration_dir(YOLO_WEIGHTS)
+    if int8 and calibration_videos and not calibration_images(calibration_dir):
+        build_calibration_set(calibration_videos, calibration_dir, max_side=imgsz)
+    return export_model(YOLO_WEIGHTS, backend, imgsz, int8, calibration_dir)
+
+def load_yolo_model(backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ, threads=YOLO_THREADS, int8=YOLO_INT8, calibration_dir=None):
+    """Loads YOLOv8 on the given inference backend.
+
+    `pytorch` uses `ultralytics` (and torch), imported only here. `onnx` and
+    `openvino` run the exported model (INT8 if `int8`) without torch; it is
+    exported on first use.
+    """
+    if backend == "pytorch":
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        model = YOLO(YOLO_WEIGHTS)
+        model.overrides["imgsz"] = imgsz  # ✅ Applied to every predict call
+        return model
+
+    return load_exported(export_yolo(backend, imgsz, int8, calibration_dir), threads)
+
+def configure_yolo(backend="pytorch", imgsz=DEFAULT_IMGSZ, threads=0, int8=False, calibration_dir=None):
+    """Selects the inference backend, input size and thread count used by `detect_objects`.
+
+    Takes effect for this process; the model is (re)loaded on its next use.
+    """
+    if backend not in YOLO_BACKENDS:
+        raise ValueError(f"Unknown YOLO backend: {backend}")
+    _yolo_settings.update({"backend": backend, "imgsz": int(imgsz), "threads": int(threads), "int8": bool(int8) and backend != "pytorch",
+                           "calibration_dir": calibration_dir})
+    register_model("yolo", partial(load_yolo_model, **_yolo_settings))
+
+def yolo_settings():
+    """Returns the current `configure_yolo` arguments, e.g. to configure worker processes the same way."""
+    return dict(_yolo_settings)
+
+def yolo_config():
+    """Returns the settings that change YOLO's output (for cache keys and reports)."""
+    return {"weights": YOLO_WEIGHTS, "backend": _yolo_settings["backend"], "imgsz": _yolo_settings["imgsz"], "int8": _yolo_settings["int8"]}
+
+# ✅ YOLO is loaded lazily, once per process, through the model registry
+register_model("yolo", load_yolo_model)
+
+def yolo_call_lock(model):
+    """Returns the lock to hold around a call into `model`: ultralytics predictors keep per-call state."""
+    return nullcontext() if getattr(model, "thread_safe", False) else inference_lock("yolo")
+
+DEFAULT_BATCH_SIZE = 8
+
+def parse_detections(result):
+    """Converts one YOLO result into a list of label/confidence/box dictionaries."""
+    detections = []
+    if hasattr(result, "names") and hasattr(result, "boxes"):
+        for box in result.boxes.data.tolist():  # ✅ [x1, y1, x2, y2, confidence, class_id]
+            class_id = int(box[5])
+            detections.append({
+                "label": result.names[class_id],
+                "class_id": class_id,
+                "confidence": float(box[4]),
+                "box": [float(value) for value in box[:4]]
+            })
+    return detections
 
 def detect_objects(frame):
     """Detects objects in a given video frame using YOLOv8."""
-    results = yolo_model(frame)
+    yolo_model = get_model("yolo")
+    with yolo_call_lock(yolo_model):
+        results = yolo_model(frame)
 
     # ✅ Extract detected object class labels
     detected_objects = []
     for result in results:
-        if hasattr(result, "names") and hasattr(result, "boxes"):
-            for box in result.boxes.data.tolist():  # ✅ Extract bounding box data
-                class_id = int(box[5])  # ✅ Get class ID
-                detected_objects.append(result.names[class_id])  # ✅ Get object label
+        detected_objects.extend(detection["label"] for detection in parse_detections(result))
 
     return detected_objects  # ✅ Returns a clean list of object names (strings)
+
+def detect_objects_batch(frames, batch_size=DEFAULT_BATCH_SIZE, metrics=None):
+    """Detects objects in several frames with one YOLOv8 call per batch.
+
+    Returns one list of detections per input frame, each detection holding the
+    label, class id, confidence and `[x1, y1, x2, y2]` box. If `metrics` (a
+    `PipelineMetrics`) is given, each YOLO call's latency is recorded as `yolo_batch`.
+    """
+    batch_size = max(int(batch_size), 1)
+    yolo_model = get_model("yolo")
+    call_lock = yolo_call_lock(yolo_model)
+    detections = []
+
+    for start in range(0, len(frames), batch_size):
+        batch = list(frames[start:start + batch_size])
+        call_start = time.perf_counter()
+        with call_lock:
+            results = yolo_model(batch, verbose=False)  # ✅ One Results object per frame, in order
+        if metrics is not None:
+            metrics.observe("yolo_batch", time.perf_counter() - call_start)
+            metrics.count("yolo_frames", len(batch))
+        detections.extend(parse_detections(result) for result in results)
+
+    return detections
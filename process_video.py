@@ -1,11 +1,26 @@
 import os
-import cv2
-import pandas as pd
-from speech_processing import extract_speech
-from scene_detection import segment_scenes
-from object_detection import detect_objects
-from emotion_detection import detect_emotion
+import time
+import queue
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from speech_processing import extract_speech, MODEL_PATH
+from scene_detection import SceneTracker, SCENE_FRAME_STRIDE
+from object_detection import detect_objects_batch, DEFAULT_BATCH_SIZE, yolo_config
+from emotion_detection import detect_emotions_batch, summarize_faces, DEFAULT_FACE_DETECTOR
 from text_summarization import summarize_text
+from frame_source import open_frame_source, DEFAULT_SAMPLE_INTERVAL_SEC, DEFAULT_DECODE_WIDTH
+from stage_scheduler import StageScheduler
+from frame_pipeline import BoundedPipeline, PIPELINE_QUEUE_SIZE
+from frame_memo import FrameMemo, record_hit_rate, DEFAULT_MEMO_DISTANCE
+from segment_processing import analyze_video_segments
+from result_cache import ResultCache, hash_file
+from model_registry import model_stats
+from debug_writer import DebugFrameWriter
+from workspace import JobWorkspace
+from metrics import PipelineMetrics
+from detection_store import DetectionStore
+from search_index import SearchIndex
 
 DEBUG_DIR = "debug_frames"  
 SRT_OUTPUT_PATH = "debug_outputs/subtitles.srt"  
@@ -23,83 +38,459 @@ def flatten_list(nested_list):
             flat_list.append(str(item))  # Convert everything to string
     return flat_list
 
-def process_video(video_path):
-    """Processes the video by extracting speech, detecting scenes, objects, and emotions."""
+def detect_frame_objects(sampled_frames, batch_size=DEFAULT_BATCH_SIZE, metrics=None, memo=None):
+    """Pipeline stage: runs YOLO on a batch of sampled frames; returns `(sampled_frames, detections, memo_entries)`.
+
+    With `memo` (a `FrameMemo`), near-duplicates of recent frames skip YOLO and
+    take the detections of the frame they match; `memo_entries` then holds one
+    `(entry, reused)` pair per frame for the later stages (else it is None).
+    """
+    metrics = metrics or PipelineMetrics()
+    with metrics.stage("object_detection"):
+        frames = [frame for _, _, frame in sampled_frames]
+        if memo is None:
+            return sampled_frames, detect_objects_batch(frames, batch_size=batch_size, metrics=metrics), None
+
+        memo_entries = [memo.lookup(frame, frame_count) for frame_count, _, frame in sampled_frames]
+        fresh = [index for index, (_, reused) in enumerate(memo_entries) if not reused]
+        # ✅ Matched frames come earlier in the video (or earlier in this batch), so their results are filled in first
+        fresh_detections = detect_objects_batch([frames[index] for index in fresh], batch_size=batch_size, metrics=metrics) if fresh else []
+        for index, detections in zip(fresh, fresh_detections):
+            memo_entries[index][0]["detections"] = detections
+        batch_detections = [entry["detections"] for entry, _ in memo_entries]
+    return sampled_frames, batch_detections, memo_entries
+
+def detect_frame_emotions(detected, emotion_cascade=False, face_detector=DEFAULT_FACE_DETECTOR, metrics=None):
+    """Pipeline stage: adds the faces of each frame to `detect_frame_objects` output (reusing memoized faces)."""
+    sampled_frames, batch_detections, memo_entries = detected
+    metrics = metrics or PipelineMetrics()
+    with metrics.stage("emotion_detection"):
+        fresh = [index for index in range(len(sampled_frames)) if memo_entries is None or not memo_entries[index][1]]
+        person_boxes = None
+        if emotion_cascade:
+            person_boxes = [[detection["box"] for detection in batch_detections[index] if detection["label"] == "person"]
+                            for index in fresh]
+        fresh_faces = detect_emotions_batch([sampled_frames[index][2] for index in fresh], person_boxes, face_detector, metrics) if fresh else []
+        if memo_entries is None:
+            return sampled_frames, batch_detections, fresh_faces, None
+
+        for position, index in enumerate(fresh):
+            memo_entries[index][0]["faces"] = fresh_faces[position]
+        batch_faces = [entry["faces"] for entry, _ in memo_entries]
+    return sampled_frames, batch_detections, batch_faces, memo_entries
+
+def build_rows(analysed, emotion_cascade=False, debug_writer=None, metrics=None, snapshot=None):
+    """Pipeline sink: turns `detect_frame_emotions` output into result rows and queues the debug frames.
+
+    Each row holds `frame_time_sec`, `objects_detected`, `facial_emotion`,
+    `frame_image`, the `detections` (label, confidence, box), the `faces`
+    (emotion, score, box) and `reused`.
+    """
+    sampled_frames, batch_detections, batch_faces, memo_entries = analysed
+    metrics = metrics or PipelineMetrics()
+    frame_analysis = []
+    reused_flags = [reused for _, reused in memo_entries] if memo_entries is not None else [False] * len(sampled_frames)
+
+    for (frame_count, frame_time_sec, frame), detections, faces, reused in zip(sampled_frames, batch_detections, batch_faces, reused_flags):
+        object_results = [detection["label"] for detection in detections]
+
+        # ✅ Ensure `object_results` is a flat list of strings (Fix TypeError)
+        flattened_objects = flatten_list(object_results)
+        object_text = ", ".join(flattened_objects) if flattened_objects else "None"
+        emotion_text = summarize_faces(faces, per_face=emotion_cascade)
+
+        # ✅ Queue frame with classification labels for the background writer, named by timestamp
+        frame_time_sec = round(frame_time_sec, 3)  # ✅ Exact frame time in seconds
+        frame_filename = None
+        if debug_writer is not None:
+            debug_frame = frame
+            if snapshot is not None:
+                debug_frame = lambda index=frame_count, fallback=frame: snapshot(index, fallback)
+            frame_filename = debug_writer.submit(debug_frame, object_text, emotion_text, f"frame_{frame_time_sec:.3f}s.jpg")
+
+        frame_analysis.append({
+            "frame_time_sec": frame_time_sec,  # ✅ Store frame timestamp (seconds)
+            "objects_detected": object_text,
+            "facial_emotion": emotion_text,
+            "frame_image": frame_filename,  # ✅ Store frame filename for reference (None if not written)
+            "detections": detections,  # ✅ Labels with confidences and boxes
+            "faces": faces or [],  # ✅ Per-face emotions and boxes
+            "reused": reused  # ✅ Results copied from a near-identical earlier frame (see `FrameMemo`)
+        })
+
+    metrics.count("frames_analysed", len(frame_analysis))
+    return frame_analysis
+
+def analyze_video(source, batch_size=DEFAULT_BATCH_SIZE, sample_interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, sampling_mode="grab",
+                  detect_scenes=True, emotion_cascade=False, debug_frames_mode="full", debug_every_n=1, frames_dir=DEBUG_DIR,
+                  metrics=None, on_frames=None, on_scene=None, stop_event=None, face_detector=DEFAULT_FACE_DETECTOR,
+                  queue_size=PIPELINE_QUEUE_SIZE, scene_tracker=None, memo_distance=DEFAULT_MEMO_DISTANCE):
+    """Runs scene detection and sampled frame analysis over one decode pass of `source`.
+
+    `on_frames(rows, frame_index)` receives each analysed batch as it completes and
+    `on_scene` each closed scene (see `SceneTracker`). Setting `stop_event` ends
+    the pass after the current batch. Pass a `scene_tracker` to read its raw cuts
+    afterwards (e.g. when `source` is one segment of the video).
+
+    Decoding, object detection and emotion detection overlap as a `BoundedPipeline`
+    with at most `queue_size` batches between two stages, so memory stays flat on
+    long videos. Queue depths and stage utilisation are set as `metrics` gauges.
+
+    With `memo_distance` set, a frame whose perceptual hash is at most that many
+    bits from a recently analysed frame reuses its results (see `FrameMemo`);
+    such rows have `reused=True` and the hit rate is set as the `memo_hit_rate` gauge.
+    """
+    metrics = metrics or PipelineMetrics()
+    memo = FrameMemo(memo_distance, metrics=metrics) if memo_distance is not None else None
+
+    # ✅ Detect scene changes on the same decode pass as the frame analysis
+    scene_tracker = scene_tracker or SceneTracker(source.fps, source.width, on_scene=on_scene)
+    if detect_scenes:
+        source.add_consumer(scene_tracker)
+
+    # ✅ Debug JPEGs are encoded off the analysis thread
+    debug_writer = DebugFrameWriter(frames_dir, mode=debug_frames_mode, every_n=debug_every_n)
+    # ✅ Downscaled decoders re-decode full-size frames for full debug snapshots, and only for those written
+    downscaled = source.width < getattr(source, "source_width", source.width)
+    snapshot = source.full_frame if downscaled and debug_frames_mode == "full" else None
+
+    # ✅ Process sampled frames only; skipped frames are grabbed or seeked past
+    batch_size = max(int(batch_size), 1)
+
+    def batches():
+        pending_frames = []
+        for sampled_frame in source.sample(sample_interval_sec, mode=sampling_mode):
+            if stop_event is not None and stop_event.is_set():
+                return
+            pending_frames.append(sampled_frame)
+
+            # ✅ Run YOLO once per full batch of sampled frames
+            if len(pending_frames) >= batch_size:
+                yield pending_frames
+                pending_frames = []
+        if pending_frames:
+            yield pending_frames
+
+    # ✅ Decode (and scene detection), YOLO and face/emotion inference each run on their own
+    # thread, joined by bounded queues; this thread builds the rows and feeds the debug writer
+    pipeline = BoundedPipeline([
+        ("object_detection", partial(detect_frame_objects, batch_size=batch_size, metrics=metrics, memo=memo), 1),
+        ("emotion_detection", partial(detect_frame_emotions, emotion_cascade=emotion_cascade, face_detector=face_detector,
+                                      metrics=metrics), 1)
+    ], queue_size=queue_size, metrics=metrics, source_name="decode")
+
+    frame_analysis = []
+    for analysed in pipeline.run(batches()):
+        rows = build_rows(analysed, emotion_cascade, debug_writer, metrics, snapshot)
+        frame_analysis.extend(rows)
+        if on_frames is not None:
+            on_frames(rows, analysed[0][-1][0])
+
+    source.release()
+    with metrics.stage("debug_frames_flush"):
+        debug_writer.close()
+
+    # ✅ Frames decoded to images vs. only grabbed past; compare with `frames_analysed`
+    metrics.count("frames_decoded", source.frames_decoded)
+    metrics.count("frames_grabbed", source.frames_grabbed)
+    if memo is not None:
+        print(f"♻️ Reused results for {metrics.counters.get('memo_hits', 0)} frames (hit rate {record_hit_rate(metrics):.1%})")
+    if detect_scenes:
+        metrics.add_stage_time("scene_detection", scene_tracker.elapsed, scene_tracker.cpu_elapsed)
+    scene_changes = scene_tracker.get_scenes() if detect_scenes else "Scene detection disabled"
+    return frame_analysis, scene_changes, scene_tracker.elapsed
+
+def stream_video(video_path, batch_size=DEFAULT_BATCH_SIZE, sample_interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, sampling_mode="grab",
+                 detect_scenes=True, use_cache=True, keep_debug_audio=False, asr_workers=1, vad=False,
+                 emotion_cascade=False, debug_frames_mode="full", debug_every_n=1, workspace=None, profile=False,
+                 update_index=True, decoder="opencv", decode_width=DEFAULT_DECODE_WIDTH, face_detector=DEFAULT_FACE_DETECTOR,
+                 segment_workers=1, segment_sec=None, segment_queue_dir=None, memo_distance=DEFAULT_MEMO_DISTANCE):
+    """Processes the video like `process_video`, yielding results as they are produced.
+
+    Yields event dicts, each with a `type`:
+
+    - `info`: `job_id` and `video_info` (fps, total frames, duration), first.
+    - `frame`: one analysis `row` and `progress` (0-1, from the frame count;
+      once per finished segment with `segment_workers > 1`).
+    - `scene`: a scene `start` and `end` timecode, once its closing cut is found.
+    - `transcript`: a recognised `text` segment with `start`/`end` seconds
+      (both None for a cached transcript).
+    - `result`: the complete `process_video` result dict, last.
+
+    Stages still run in parallel worker threads, so a slow consumer does not
+    slow them down. Closing the generator early (e.g. breaking out of the loop)
+    stops frame analysis after the current batch and stops feeding the
+    recognizer; nothing from a stopped run is cached.
+
+    A workspace created here because none was given is deleted once the
+    generator finishes, so its files are only there while the `result` event
+    is being handled; pass a `workspace` to keep them.
+    """
+    owns_workspace = workspace is None
+    workspace = workspace or JobWorkspace()
+    try:
+        yield from _stream_job(video_path, batch_size, sample_interval_sec, sampling_mode, detect_scenes, use_cache,
+                               keep_debug_audio, asr_workers, vad, emotion_cascade, debug_frames_mode,
+                               debug_every_n, workspace, profile, update_index, decoder, decode_width,
+                               face_detector, segment_workers, segment_sec, segment_queue_dir, memo_distance)
+    finally:
+        if owns_workspace:
+            workspace.remove()  # ✅ No caller can reach this job's directory, so it would only pile up under jobs/
+
+def _stream_job(video_path, batch_size=DEFAULT_BATCH_SIZE, sample_interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, sampling_mode="grab",
+                detect_scenes=True, use_cache=True, keep_debug_audio=False, asr_workers=1, vad=False,
+                emotion_cascade=False, debug_frames_mode="full", debug_every_n=1, workspace=None, profile=False,
+                update_index=True, decoder="opencv", decode_width=DEFAULT_DECODE_WIDTH, face_detector=DEFAULT_FACE_DETECTOR,
+                segment_workers=1, segment_sec=None, segment_queue_dir=None, memo_distance=DEFAULT_MEMO_DISTANCE):
+    """Runs one `stream_video` job; every file it writes goes into `workspace`."""
 
     # ✅ Ensure video file exists
     if not os.path.exists(video_path):
-        return {"error": " Video file not found!"}
+        yield {"type": "result", "results": {"error": " Video file not found!"}}
+        return
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        return {"error": " Unable to open video file."}
+    source = open_frame_source(video_path, decoder, decode_width)
+    if not source.is_opened():
+        yield {"type": "result", "results": {"error": " Unable to open video file."}}
+        return
 
-    frame_count = 0
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    total_frames = source.total_frames
+    fps = source.fps
+    video_info = {
+        "fps": fps,
+        "total_frames": total_frames,
+        "duration_sec": round(total_frames / fps, 3) if fps > 0 else None
+    }
 
-    print(f"🎥 Processing Video: {video_path} | FPS: {fps} | Total Frames: {total_frames}")
+    print(f"🎥 Processing Video: {video_path} | Job: {workspace.job_id} | FPS: {fps:.3f} | Total Frames: {total_frames} | Sampling: {sampling_mode}")
+    yield {"type": "info", "job_id": workspace.job_id, "video_info": video_info}
 
-    # ✅ Extract speech & generate subtitles
-    transcript, audio_debug_file, srt_file_path = extract_speech(video_path)
+    # ✅ Look up per-stage results by video content hash + stage configuration
+    cache = ResultCache() if use_cache else None
+    video_hash = hash_file(video_path) if cache or update_index else None
+    speech_config = {"model_path": MODEL_PATH, "asr_mode": "parallel" if asr_workers > 1 else "stream", "vad": vad}
+    video_config = {
+        "yolo": yolo_config(),  # ✅ Weights, backend, input size and INT8 all change detections
+        "sample_interval_sec": sample_interval_sec,
+        "sampling_mode": sampling_mode,
+        "detect_scenes": detect_scenes,
+        "scene_frame_stride": SCENE_FRAME_STRIDE if detect_scenes else None,
+        "emotion_cascade": emotion_cascade,
+        "face_detector": face_detector,
+        "decoder": decoder,
+        "decode_width": decode_width if decoder == "ffmpeg" else None,
+        "memo_distance": memo_distance  # ✅ Reused near-duplicate results differ from fresh ones
+    }
+    summary_config = {"speech": speech_config, "segmentation": "pause"}
 
-    # ✅ Handle case where no speech is detected
-    if transcript.strip() in ["", " No speech detected."]:
-        transcript = "No speech detected."
-        srt_file_path = None  
+    cached_speech = cache.load(video_hash, "speech", speech_config) if cache else None
+    cached_video = cache.load(video_hash, "video", video_config) if cache else None
+    if cached_video is not None and not cached_video.get("detections"):
+        cached_video = None  # ✅ Detection arrays missing from the entry: recompute
+    cached_summary = cache.load(video_hash, "summary", summary_config) if cache else None
 
-    # ✅ Detect scene changes
-    scene_changes = segment_scenes(video_path)
+    # ✅ Stage threads push partial results here; this generator drains and yields them
+    events = queue.Queue()
+    stop_event = threading.Event()
 
-    # ✅ Process frame-by-frame analysis
-    frame_analysis = []
-    frame_skip_interval = max(fps // 2, 1)  
+    def on_frames(rows, frame_index):
+        progress = min((frame_index + 1) / total_frames, 1.0) if total_frames > 0 else None
+        for row in rows:
+            events.put({"type": "frame", "row": row, "progress": progress})
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break  # ✅ Stop processing if no more frames
+    def on_scene(start, end):
+        events.put({"type": "scene", "start": start, "end": end})
 
-        if frame_count % frame_skip_interval == 0:  
-            object_results = detect_objects(frame)
-            emotion_result = detect_emotion(frame)
+    def on_segment(segment):
+        events.put(dict(segment, type="transcript"))
 
-            # ✅ Ensure `object_results` is a flat list of strings (Fix TypeError)
-            flattened_objects = flatten_list(object_results)
-            object_text = ", ".join(flattened_objects) if flattened_objects else "None"
-            emotion_text = str(emotion_result) if isinstance(emotion_result, str) else "Neutral"
+    # ✅ Run speech extraction and the video branch (scenes + frames) in parallel
+    pipeline_start = time.perf_counter()
+    metrics = PipelineMetrics(profile_dir=workspace.output_dir if profile else None).start()
+    scheduler = StageScheduler(metrics=metrics)
+    speech_stats = {}
+    speech_words = []
+    if cached_speech is None:
+        scheduler.add_stage("speech", extract_speech, video_path, keep_debug_audio=keep_debug_audio, workers=asr_workers,
+                            vad=vad, stats=speech_stats, output_dir=workspace.debug_dir, metrics=metrics,
+                            on_segment=on_segment, stop_event=stop_event, words=speech_words)
+    else:
+        events.put({"type": "transcript", "text": cached_speech["transcription"], "start": None, "end": None})
+    if cached_video is not None:
+        source.release()
+        cached_store = DetectionStore.load(cached_video["detections"], frames_dir="")  # ✅ Debug frames are not cached
+        for row in cached_store.iter_rows():
+            events.put({"type": "frame", "row": row, "progress": 1.0})
+        if isinstance(cached_video["scene_changes"], list):
+            for start, end in cached_video["scene_changes"]:
+                on_scene(start, end)
+    elif segment_workers > 1:
+        source.release()  # ✅ Each segment worker opens its own source
+        scheduler.add_stage("video", analyze_video_segments, video_path, workspace.frames_dir, segment_workers, segment_sec,
+                            segment_queue_dir, batch_size, sample_interval_sec, sampling_mode, detect_scenes, emotion_cascade,
+                            debug_frames_mode, debug_every_n, metrics, on_frames=on_frames, on_scene=on_scene,
+                            stop_event=stop_event, face_detector=face_detector, decoder=decoder, decode_width=decode_width,
+                            memo_distance=memo_distance)
+    else:
+        scheduler.add_stage("video", analyze_video, source, batch_size, sample_interval_sec, sampling_mode,
+                            detect_scenes, emotion_cascade, debug_frames_mode, debug_every_n, workspace.frames_dir, metrics,
+                            on_frames=on_frames, on_scene=on_scene, stop_event=stop_event, face_detector=face_detector,
+                            memo_distance=memo_distance)
 
-            # ✅ Save frame with classification labels using frame timestamp
-            frame_time_sec = int(frame_count / fps)  # ✅ Get frame time in seconds
-            frame_filename = f"{DEBUG_DIR}/frame_{frame_time_sec}s.jpg"
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline") as executor:
+        future = executor.submit(scheduler.run)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=0.1)
+                except queue.Empty:
+                    if future.done() and events.empty():
+                        break  # ✅ Every stage has finished and every event was yielded
+                    continue
+                yield event
+        finally:
+            if not future.done():
+                stop_event.set()  # ✅ Consumer stopped early: wind the stages down
+                metrics.stop()
+    outputs, stage_timings = future.result()
 
-            cv2.putText(frame, f"Objects: {object_text}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            cv2.putText(frame, f"Emotion: {emotion_text}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-            cv2.imwrite(frame_filename, frame)
+    if cached_speech is None:
+        transcript, audio_debug_file, srt_file_path = outputs["speech"]
 
-            frame_analysis.append({
-                "frame_time_sec": frame_time_sec,  # ✅ Store frame timestamp (seconds)
-                "objects_detected": object_text,
-                "facial_emotion": emotion_text,
-                "frame_image": frame_filename  # ✅ Store frame filename for reference
-            })
+        # ✅ Handle case where no speech is detected
+        if transcript.strip() in ["", " No speech detected."]:
+            transcript = "No speech detected."
+            srt_file_path = None  
 
-        frame_count += 1
+        if cache and "Error processing speech" not in transcript:
+            cache.store(video_hash, "speech", speech_config, {"transcription": transcript, "words": speech_words},
+                        files={"srt_file": srt_file_path})
+    else:
+        transcript = cached_speech["transcription"]
+        speech_words = cached_speech.get("words") or []  # ✅ Entries cached before word timings were stored have none
+        srt_file_path = cached_speech.get("srt_file")
+        audio_debug_file = None  # ✅ Extracted audio is not kept in the cache
 
-    cap.release()
+    if cached_video is None:
+        frame_analysis, scene_changes, stage_timings["scene_detection"] = outputs["video"]
+        detection_store = DetectionStore.from_rows(frame_analysis, workspace.frames_dir)
+        if cache and not isinstance(scene_changes, dict):  # ✅ Don't cache a failed scene pass
+            store_dir = detection_store.save(os.path.join(workspace.output_dir, "detections"), "npy")
+            cache.store(video_hash, "video", video_config, {"scene_changes": scene_changes}, files={"detections": store_dir})
+    else:
+        detection_store = cached_store
+        scene_changes = cached_video["scene_changes"]
+        if isinstance(scene_changes, list):
+            scene_changes = [tuple(scene) for scene in scene_changes]  # ✅ JSON turns tuples into lists
 
     # ✅ Generate Summary of Transcribed Text
-    summary = summarize_text(transcript)
+    if cached_speech is not None and cached_summary is not None:
+        summary = cached_summary["speech_summary"]
+    else:
+        summary_start = time.perf_counter()
+        with metrics.stage("summarization"):
+            # ✅ Word timings let the summarizer split the unpunctuated transcript at pauses
+            summary = metrics.profiled("summarization", summarize_text)(transcript, speech_words)
+        stage_timings["summarization"] = time.perf_counter() - summary_start
+        if cache:
+            cache.store(video_hash, "summary", summary_config, {"speech_summary": summary})
 
-    # ✅ Convert frame analysis to a structured DataFrame
-    frame_df = pd.DataFrame(frame_analysis)
+    # ✅ Record object, emotion and word time ranges in the cross-video search index
+    if update_index:
+        try:
+            with metrics.stage("search_index"):
+                # ✅ Uploads are deleted with their job workspace: show those by file name; the hash stays the key
+                video_name = os.path.basename(video_path) if workspace.contains(video_path) else None
+                SearchIndex().index_video(video_hash, video_path, detection_store, speech_words, video_info["duration_sec"], video_name)
+        except Exception as e:
+            print(f"❌ Error updating search index: {e}")
+    stage_timings["total"] = time.perf_counter() - pipeline_start
+    metrics.stop()
 
-    return {
+    yield {"type": "result", "results": {
+        "job_id": workspace.job_id,
+        "frames_dir": workspace.frames_dir,  # ✅ Where this job's debug frames were written
+        "video_info": video_info,
         "speech_summary": summary if summary else "No speech detected.",
         "transcription": transcript,  # ✅ Attach full transcription data
         "srt_file": srt_file_path,  # ✅ Include subtitle file path
         "scene_changes": scene_changes,
-        "frame_analysis": frame_df,  # ✅ Include structured DataFrame for table display
+        "detections": detection_store,  # ✅ Columnar boxes/confidences/emotions; `.display_frame()` for the table
         "audio_debug_file": audio_debug_file,  # ✅ Attach extracted audio file for debugging
-        "debug_frames": frame_analysis  # ✅ Attach saved frame images with numbers
-    }
+        "stage_timings": stage_timings,  # ✅ Wall-clock seconds per stage
+        "speech_stats": speech_stats,  # ✅ VAD speech ratio and ASR time saved (when enabled)
+        "model_stats": model_stats(),  # ✅ Load time and memory per model
+        "metrics": metrics.to_dict(),  # ✅ Wall/CPU per stage, frame counts, latency percentiles, peak RSS
+        "cache_hits": [stage for stage, cached in (("speech", cached_speech), ("video", cached_video), ("summary", cached_summary)) if cached is not None]
+    }}
+
+def process_video(video_path, batch_size=DEFAULT_BATCH_SIZE, sample_interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, sampling_mode="grab",
+                  detect_scenes=True, use_cache=True, keep_debug_audio=False, asr_workers=1, vad=False,
+                  emotion_cascade=False, debug_frames_mode="full", debug_every_n=1, workspace=None, profile=False,
+                  update_index=True, decoder="opencv", decode_width=DEFAULT_DECODE_WIDTH, face_detector=DEFAULT_FACE_DETECTOR,
+                  segment_workers=1, segment_sec=None, segment_queue_dir=None, memo_distance=DEFAULT_MEMO_DISTANCE):
+    """Processes the video by extracting speech, detecting scenes, objects, and emotions.
+
+    `sampling_mode` is `grab` (default), `seek` or `keyframe`; see `FrameSource.sample`.
+    In `grab` mode scene detection converts every `SCENE_FRAME_STRIDE`-th frame
+    (default 3, env `SCENE_FRAME_STRIDE`) to BGR and the sampled frames; every other
+    frame is only grabbed. Set `detect_scenes=False` to decode the sampled frames only. With `use_cache`, each stage result is
+    reused from the on-disk `ResultCache` when the video content and that
+    stage's configuration are unchanged. Audio is streamed from FFmpeg into Vosk;
+    set `keep_debug_audio` to also write the extracted WAV for playback.
+    `asr_workers > 1` splits transcription across that many processes, and `vad`
+    only sends the speech regions found by the energy VAD to Vosk.
+    `emotion_cascade` gates face detection on YOLO person detections, and
+    `face_detector` picks DeepFace's face detector, e.g. `opencv` (fast) or
+    `retinaface` (accurate); face crops are scored in batches (see `detect_emotions_batch`).
+    `debug_frames_mode` is `full`, `thumbnail` or `off`, and `debug_every_n` keeps
+    only every n-th annotated frame.
+    Every file the job writes goes into `workspace` (a `JobWorkspace`); a new one
+    is created when none is given, so concurrent calls never share files, and
+    deleted before returning, so the returned file paths are then None. Pass a
+    `workspace` to keep debug frames, subtitles, audio and profiles.
+    Per-stage wall/CPU time, frame counts, model latency percentiles and peak RSS
+    are returned under `metrics` (see `metrics.format_prometheus` for export);
+    `profile=True` also runs each stage under cProfile and writes the `.prof`
+    files to the workspace's `output/` directory.
+    Frame results come back as a columnar `DetectionStore` under `detections`;
+    its `display_frame()` gives the per-frame table shown in the app.
+    With `update_index`, the video's objects, emotions and spoken words are
+    added to the SQLite `SearchIndex` (see `search_index.py` to query it).
+    `decoder="ffmpeg"` reads frames from an FFmpeg rawvideo pipe scaled to at most
+    `decode_width` pixels wide, with the sampling done by FFmpeg's `fps` filter
+    (see `FFmpegFrameSource`); scene detection then only sees the sampled frames.
+    `segment_workers > 1` splits the frame analysis into keyframe-aligned time
+    segments analysed in that many processes and merged with whole-video
+    timestamps and scenes (see `analyze_video_segments`); `segment_sec` sets the
+    segment length and `segment_queue_dir` hands the segments out through a
+    `FileWorkQueue` in that directory instead of a process pool.
+    `memo_distance` (e.g. 4) lets near-duplicate sampled frames, such as in
+    static lecture or CCTV footage, reuse the results of a recent frame whose
+    64-bit perceptual hash differs in at most that many bits; those rows are
+    marked `reused` and the hit rate is reported as the `memo_hit_rate` gauge.
+
+    This runs `stream_video` to completion and returns its final result.
+    """
+    owns_workspace = workspace is None
+    workspace = workspace or JobWorkspace()
+    results = None
+    try:
+        for event in stream_video(video_path, batch_size, sample_interval_sec, sampling_mode, detect_scenes, use_cache,
+                                  keep_debug_audio, asr_workers, vad, emotion_cascade, debug_frames_mode, debug_every_n,
+                                  workspace, profile, update_index, decoder, decode_width, face_detector,
+                                  segment_workers, segment_sec, segment_queue_dir, memo_distance):
+            if event["type"] == "result":
+                results = event["results"]
+    finally:
+        if owns_workspace:
+            workspace.remove()
+
+    # ✅ Files in the deleted workspace are gone: don't hand back paths to them
+    if owns_workspace and results and "job_id" in results:
+        for key in ("frames_dir", "srt_file", "audio_debug_file"):
+            if results.get(key) and workspace.contains(results[key]):
+                results[key] = None
+        results["detections"].frames_dir = ""  # ✅ As for cached stores: no debug frames
+        results["metrics"]["profiles"] = {}
+    return results
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+CACHE_DIR = "cache"
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 ** 3  # ✅ 2 GB, override per ResultCache
+CACHE_VERSION = 2  # ✅ Bump to invalidate every entry after a result format change
+RESULT_FILE = "result.json"
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_config(config):
+    """Returns a short stable hash of a JSON-serialisable stage configuration."""
+    payload = json.dumps({"version": CACHE_VERSION, "config": config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def directory_size(path):
+    """Returns the total size in bytes of all files below `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class ResultCache:
+    """On-disk per-stage result cache keyed by video content hash and stage configuration.
+
+    Each entry lives in `<cache_dir>/<video_hash>/<stage>-<config_hash>/` and holds
+    a JSON result plus any attached files. Least recently used entries are
+    evicted once the cache grows past `max_bytes`.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_dir(self, video_hash, stage, config):
+        """Returns the directory holding one stage result."""
+        return os.path.join(self.cache_dir, video_hash, f"{stage}-{hash_config(config)}")
+
+    def load(self, video_hash, stage, config):
+        """Returns the cached data for a stage, or None on a miss.
+
+        File attachments are returned as paths inside the cache entry.
+        """
+        entry = self.entry_dir(video_hash, stage, config)
+        result_path = os.path.join(entry, RESULT_FILE)
+        if not os.path.exists(result_path):
+            return None
+
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except Exception as e:
+            print(f"❌ Error reading cache entry {entry}: {e}")
+            return None
+
+        data = record.get("data", {})
+        for key, file_name in record.get("files", {}).items():
+            file_path = os.path.join(entry, file_name)
+            data[key] = file_path if os.path.exists(file_path) else None
+
+        # ✅ Mark the entry as recently used for LRU eviction
+        os.utime(result_path, None)
+        print(f"✅ Cache hit: {stage} ({video_hash[:12]})")
+        return data
+
+    def store(self, video_hash, stage, config, data, files=None):
+        """Stores a stage result and copies `files` ({key: path}) into the entry.
+
+        A path may also be a directory (e.g. a saved `DetectionStore`); it is copied whole.
+        """
+        entry = self.entry_dir(video_hash, stage, config)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        staging = None
+        try:
+            # ✅ Build the entry in a temp dir and rename it so readers never see half an entry
+            staging = tempfile.mkdtemp(prefix=f".{stage}-", dir=os.path.dirname(entry))
+            stored_files = {}
+            for key, path in (files or {}).items():
+                if path and os.path.isdir(path):
+                    shutil.copytree(path, os.path.join(staging, key))
+                    stored_files[key] = key
+                elif path and os.path.exists(path):
+                    file_name = f"{key}{os.path.splitext(path)[1]}"
+                    shutil.copyfile(path, os.path.join(staging, file_name))
+                    stored_files[key] = file_name
+
+            record = {"stage": stage, "config": config, "created": time.time(), "data": data, "files": stored_files}
+            with open(os.path.join(staging, RESULT_FILE), "w", encoding="utf-8") as f:
+                json.dump(record, f, default=str)
+
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except Exception as e:
+            print(f"❌ Error writing cache entry {entry}: {e}")
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for video_hash in os.listdir(self.cache_dir):
+            video_dir = os.path.join(self.cache_dir, video_hash)
+            if not os.path.isdir(video_dir):
+                continue
+            for stage_entry in os.listdir(video_dir):
+                entry = os.path.join(video_dir, stage_entry)
+                result_path = os.path.join(entry, RESULT_FILE)
+                if stage_entry.startswith(".") or not os.path.exists(result_path):
+                    continue
+                entries.append((os.path.getmtime(result_path), directory_size(entry), entry))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_bytes -= size
+            print(f"🗑️ Evicted cache entry: {entry}")
+
+            # ✅ Drop the video directory once its last stage is gone
+            video_dir = os.path.dirname(entry)
+            try:
+                if not os.listdir(video_dir):
+                    os.rmdir(video_dir)
+            except OSError:
+                pass
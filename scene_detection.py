@@ -1,10 +1,16 @@
 from scenedetect import VideoManager, SceneManager
 from scenedetect.detectors import ContentDetector
+from scenedetect.frame_timecode import FrameTimecode
+from scenedetect.scene_manager import compute_downscale_factor
 import os
+import time
+
+# ✅ Frames between scene-detector checks in `grab` sampling; the frames in between are never converted to BGR
+SCENE_FRAME_STRIDE = max(int(os.environ.get("SCENE_FRAME_STRIDE", "3")), 1)
 
 def segment_scenes(video_path):
     """Segments video into scenes based on content changes."""
-    
+
     # ✅ Ensure video file exists before processing
     if not os.path.exists(video_path):
         return {"error": "❌ Video file not found!"}
@@ -29,3 +35,76 @@ def segment_scenes(video_path):
     except Exception as e:
         print(f"❌ Error in scene detection: {e}")
         return {"error": "❌ Scene detection failed due to an error."}
+
+def scenes_from_cuts(cuts, last_frame_index, fps):
+    """Turns cut frame indices into `(start, end)` timecodes, in the same format as `segment_scenes`."""
+    cuts = sorted(set(cut for cut in cuts if cut > 0))
+
+    # ✅ Handle case where no scene changes are detected
+    if not cuts:
+        return "No scene changes detected"
+
+    boundaries = [0] + cuts + [last_frame_index + 1]
+    return [
+        (FrameTimecode(start, fps).get_timecode(), FrameTimecode(end, fps).get_timecode())
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+class SceneTracker:
+    """Detects scene changes on frames pushed from a shared decode loop.
+
+    `on_scene(start_timecode, end_timecode)` is called as soon as a cut closes a
+    scene; the last scene is only known once `get_scenes()` runs.
+
+    A `FrameSource` feeds it every `frame_stride`-th frame in `grab` sampling,
+    so cuts are placed to within `frame_stride` frames; 1 checks every frame.
+    """
+    def __init__(self, fps, frame_width, on_scene=None, frame_stride=SCENE_FRAME_STRIDE):
+        self.fps = fps
+        self.on_scene = on_scene
+        self.frame_stride = max(int(frame_stride), 1)
+        self.last_cut = 0
+        self.detector = ContentDetector()
+        # ✅ scenedetect >= 0.6.5 returns a float factor; slicing needs an integer step
+        self.downscale_factor = max(int(compute_downscale_factor(frame_width)), 1) if frame_width else 1
+        self.cuts = []
+        self.last_frame_index = None
+        self.failed = False
+        self.elapsed = 0.0  # ✅ Seconds spent in the detector, for stage timings
+        self.cpu_elapsed = 0.0  # ✅ Thread CPU seconds spent in the detector
+
+    def process_frame(self, frame_index, frame):
+        """Feeds one decoded BGR frame to the content detector."""
+        if self.failed:
+            return
+
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            # ✅ Same subsampling VideoManager applies with set_downscale_factor()
+            if self.downscale_factor > 1:
+                frame = frame[::self.downscale_factor, ::self.downscale_factor, :]
+
+            new_cuts = self.detector.process_frame(frame_index, frame)
+            self.cuts.extend(new_cuts)
+            self.last_frame_index = frame_index
+
+            for cut in sorted(new_cuts):
+                if self.on_scene is not None and cut > self.last_cut:
+                    self.on_scene(FrameTimecode(self.last_cut, self.fps).get_timecode(), FrameTimecode(cut, self.fps).get_timecode())
+                    self.last_cut = cut
+        except Exception as e:
+            print(f"❌ Error in scene detection: {e}")
+            self.failed = True
+        self.elapsed += time.perf_counter() - start
+        self.cpu_elapsed += time.thread_time() - cpu_start
+
+    def get_scenes(self):
+        """Returns scene boundaries in the same format as `segment_scenes`."""
+        if self.failed:
+            return {"error": "❌ Scene detection failed due to an error."}
+
+        if self.last_frame_index is not None:
+            self.cuts.extend(self.detector.post_process(self.last_frame_index))
+
+        return scenes_from_cuts(self.cuts, self.last_frame_index, self.fps)
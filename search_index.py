@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+import numpy as np
+
+SEARCH_INDEX_PATH = "search_index.db"
+DEFAULT_SAMPLE_INTERVAL_SEC = 0.5
+DEFAULT_TOLERANCE_MS = 1000  # ✅ Moments this close together still count as "while"
+SKIPPED_EMOTIONS = {"no face detected", "error", ""}
+CONDITION_TABLES = {"object": ("objects", "label"), "emotion": ("emotions", "emotion"), "word": ("words", "word")}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    video_hash TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    duration_ms INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    confidence REAL
+);
+CREATE TABLE IF NOT EXISTS emotions (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    emotion TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS words (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    word TEXT NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS objects_label ON objects(label, video_id, start_ms);
+CREATE INDEX IF NOT EXISTS emotions_emotion ON emotions(emotion, video_id, start_ms);
+CREATE INDEX IF NOT EXISTS words_word ON words(word, video_id, start_ms);
+"""
+
+def merge_runs(times_sec, interval_sec):
+    """Merges sorted sample times into `(start_ms, end_ms)` runs.
+
+    Each sample is taken to cover `interval_sec` from its timestamp; samples
+    further apart than 1.5 intervals start a new run.
+    """
+    runs = []
+    for time_sec in times_sec:
+        start_ms, end_ms = int(round(time_sec * 1000)), int(round((time_sec + interval_sec) * 1000))
+        if runs and start_ms <= runs[-1][1] + interval_sec * 500:
+            runs[-1][1] = end_ms
+        else:
+            runs.append([start_ms, end_ms])
+    return [tuple(run) for run in runs]
+
+class SearchIndex:
+    """Persistent SQLite index of object, emotion and spoken-word time ranges per video.
+
+    Videos are keyed by content hash, so re-indexing a video replaces its rows.
+    Each call opens its own connection, so the index can be shared by Streamlit
+    sessions and batch worker processes (SQLite serialises the writers).
+    """
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection inside one transaction (committed, or rolled back on error) and closes it."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # ✅ Readers don't block the writer
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()  # ✅ sqlite3's own context manager only ends the transaction
+
+    def index_video(self, video_hash, video_path, detection_store, words=None, duration_sec=None, name=None):
+        """Replaces the index rows of one video from its `DetectionStore` and Vosk word timings.
+
+        Results show the video as `name`, e.g. the original file name of an upload
+        whose temporary copy is deleted later; by default its absolute path.
+        """
+        frame_times = np.asarray(detection_store.frames["frame_time_sec"], dtype=np.float64)
+        gaps = np.diff(frame_times)
+        interval_sec = float(np.median(gaps)) if len(gaps) else DEFAULT_SAMPLE_INTERVAL_SEC
+
+        # ✅ Consecutive sampled frames showing the same label collapse into one range
+        object_rows = []
+        detections = detection_store.detections_frame()
+        for label, group in detections.groupby("label"):
+            times = np.unique(group["frame_time_sec"].to_numpy())
+            confidence = float(group["confidence"].max())
+            object_rows.extend((str(label).lower(), start, end, confidence) for start, end in merge_runs(times, interval_sec))
+
+        emotion_times = {}
+        for time_sec, text in zip(frame_times, detection_store.display_frame()["facial_emotion"]):
+            for emotion in str(text).lower().split(", "):  # ✅ Cascade mode joins one emotion per face
+                if emotion not in SKIPPED_EMOTIONS:
+                    emotion_times.setdefault(emotion, []).append(time_sec)
+        emotion_rows = [
+            (emotion, start, end)
+            for emotion, times in emotion_times.items()
+            for start, end in merge_runs(sorted(set(times)), interval_sec)
+        ]
+
+        word_rows = [
+            (word["word"].lower(), int(round(word["start"] * 1000)), int(round(word["end"] * 1000)), word.get("conf"))
+            for word in words or [] if word.get("word")
+        ]
+
+        with self._connect() as conn:  # ✅ One transaction: readers see the old or the new rows, never half
+            conn.execute("DELETE FROM videos WHERE video_hash = ?", (video_hash,))
+            cursor = conn.execute(
+                "INSERT INTO videos (video_hash, path, duration_ms, indexed_at) VALUES (?, ?, ?, ?)",
+                (video_hash, name or os.path.abspath(video_path), int(duration_sec * 1000) if duration_sec else None, time.time())
+            )
+            video_id = cursor.lastrowid
+            conn.executemany("INSERT INTO objects VALUES (?, ?, ?, ?, ?)", [(video_id, *row) for row in object_rows])
+            conn.executemany("INSERT INTO emotions VALUES (?, ?, ?, ?)", [(video_id, *row) for row in emotion_rows])
+            conn.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?)", [(video_id, *row) for row in word_rows])
+
+        print(f"🔎 Indexed {len(object_rows)} object, {len(emotion_rows)} emotion and {len(word_rows)} word ranges for {video_path}")
+        return video_id
+
+    def search(self, objects=(), emotions=(), words=(), tolerance_ms=DEFAULT_TOLERANCE_MS, limit=1000):
+        """Returns moments where every given object, emotion and word occurs together.
+
+        Each term must have a range within `tolerance_ms` of the first term's
+        range in the same video. Results are dicts with `path`, `video_hash`,
+        `start_ms` and `end_ms` (the overlap of the matched ranges, or the gap
+        between them when they only meet within the tolerance), merged per video.
+        """
+        conditions = [("object", term) for term in objects] + [("emotion", term) for term in emotions] + [("word", term) for term in words]
+        if not conditions:
+            return []
+
+        selects, joins, params = [], [], []
+        for i, (kind, term) in enumerate(conditions):
+            table, column = CONDITION_TABLES[kind]
+            selects += [f"c{i}.start_ms", f"c{i}.end_ms"]
+            if i == 0:
+                joins.append(f"FROM {table} c0 JOIN videos v ON v.id = c0.video_id")
+                where = [f"c0.{column} = ?"]
+                first_param = term.lower()
+            else:
+                joins.append(
+                    f"JOIN {table} c{i} ON c{i}.video_id = c0.video_id AND c{i}.{column} = ? "
+                    f"AND c{i}.start_ms <= c0.end_ms + ? AND c{i}.end_ms >= c0.start_ms - ?"
+                )
+                params += [term.lower(), tolerance_ms, tolerance_ms]
+        params.append(first_param)
+
+        query = f"SELECT v.path, v.video_hash, {', '.join(selects)} {' '.join(joins)} WHERE {' AND '.join(where)} ORDER BY v.path, c0.start_ms LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(query, params + [limit]).fetchall()
+
+        moments = []
+        for path, video_hash, *bounds in rows:
+            start_ms, end_ms = max(bounds[0::2]), min(bounds[1::2])
+            if start_ms > end_ms:
+                start_ms, end_ms = end_ms, start_ms  # ✅ Matched within the tolerance but not overlapping
+            previous = moments[-1] if moments else None
+            if previous and previous["video_hash"] == video_hash and start_ms <= previous["end_ms"]:
+                previous["end_ms"] = max(previous["end_ms"], end_ms)
+            else:
+                moments.append({"path": path, "video_hash": video_hash, "start_ms": start_ms, "end_ms": end_ms})
+        return moments
+
+    def videos(self):
+        """Returns every indexed video with its path, duration and index time."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT video_hash, path, duration_ms, indexed_at FROM videos ORDER BY path").fetchall()
+        return [{"video_hash": row[0], "path": row[1], "duration_ms": row[2], "indexed_at": row[3]} for row in rows]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search processed videos for moments with objects, emotions and words.")
+    parser.add_argument("--index", default=SEARCH_INDEX_PATH, help="SQLite index file")
+    parser.add_argument("--object", action="append", default=[], help="Object label, e.g. dog (repeatable)")
+    parser.add_argument("--emotion", action="append", default=[], help="Facial emotion, e.g. happy (repeatable)")
+    parser.add_argument("--word", action="append", default=[], help="Spoken word, e.g. delivery (repeatable)")
+    parser.add_argument("--tolerance-ms", type=int, default=DEFAULT_TOLERANCE_MS)
+    parser.add_argument("--list", action="store_true", help="List the indexed videos")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        print(f"❌ No search index at {args.index}")
+        return 1
+    index = SearchIndex(args.index)
+
+    if args.list:
+        for video in index.videos():
+            print(f"{video['video_hash'][:12]}  {video['path']}")
+        return 0
+
+    moments = index.search(args.object, args.emotion, args.word, args.tolerance_ms)
+    for moment in moments:
+        print(f"{moment['path']}  {moment['start_ms']}ms - {moment['end_ms']}ms")
+    print(f"✅ {len(moments)} moments found")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pickle
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from scenedetect.frame_timecode import FrameTimecode
+from frame_source import FrameSource, open_frame_source, DEFAULT_SAMPLE_INTERVAL_SEC, DEFAULT_DECODE_WIDTH
+from scene_detection import SceneTracker, scenes_from_cuts
+from object_detection import DEFAULT_BATCH_SIZE, yolo_settings, export_yolo
+from emotion_detection import DEFAULT_FACE_DETECTOR
+from frame_memo import record_hit_rate, DEFAULT_MEMO_DISTANCE
+from metrics import PipelineMetrics
+
+DEFAULT_SEGMENT_SEC = 300.0  # ✅ Upper bound; shorter videos are split evenly across the workers
+MIN_SEGMENT_SEC = 30.0  # ✅ Shorter segments spend more time loading models than analysing
+SCENE_LOOKAHEAD_FRAMES = 60  # ✅ Well past ContentDetector's 15-frame minimum scene length
+QUEUE_POLL_INTERVAL_SEC = 0.2
+
+def plan_segments(total_frames, fps, keyframe_times=None, segment_sec=DEFAULT_SEGMENT_SEC):
+    """Splits `total_frames` into `{"index", "start_frame", "end_frame"}` segments of about `segment_sec`.
+
+    Each segment after the first starts on the first keyframe at or after its
+    target time, so a worker's seek lands exactly where decoding can begin.
+    Without keyframe times the targets are used as they are (OpenCV then decodes
+    forward from the previous keyframe). A tail shorter than half a segment is
+    folded into the last segment.
+    """
+    if total_frames <= 0 or fps <= 0:
+        return [{"index": 0, "start_frame": 0, "end_frame": None}]
+
+    segment_frames = max(int(round(segment_sec * fps)), 1)
+    keyframes = sorted({int(round(keyframe_time * fps)) for keyframe_time in keyframe_times or []})
+
+    starts = [0]
+    target = segment_frames
+    while target < total_frames - segment_frames // 2:
+        start = next((keyframe for keyframe in keyframes if keyframe >= target), None) if keyframes else target
+        if start is None or start >= total_frames - segment_frames // 2:
+            break
+        starts.append(start)
+        target = start + segment_frames
+
+    ends = starts[1:] + [total_frames]
+    return [{"index": index, "start_frame": start, "end_frame": end} for index, (start, end) in enumerate(zip(starts, ends))]
+
+def owned_cuts(cuts, segment, lookahead_frames, last):
+    """Returns the cuts of `segment` it is responsible for in the merged scene list.
+
+    A segment's detector only reports cuts a minimum scene length after its
+    first frame, so the previous segment reads `lookahead_frames` past its end
+    and owns every cut up to there; the next segment takes over after that.
+    """
+    low = segment["start_frame"] + lookahead_frames if segment["index"] > 0 else 0
+    high = None if last else segment["end_frame"] + lookahead_frames
+    return sorted(cut for cut in set(cuts) if cut >= low and (high is None or cut < high))
+
+def process_segment(video_path, segment, options, frames_dir):
+    """Analyses the sampled frames of one segment (runs in a worker process).
+
+    `options` are `analyze_video` settings plus `decoder`/`decode_width`.
+    Returns the rows, the raw scene cuts (global frame indices), the last frame
+    the scene detector saw and a `PipelineMetrics.snapshot()`.
+    """
+    from process_video import analyze_video  # ✅ Imported here: process_video imports this module
+
+    options = dict(options)
+    decoder = options.pop("decoder", "opencv")
+    decode_width = options.pop("decode_width", DEFAULT_DECODE_WIDTH)
+    lookahead_frames = options.pop("lookahead_frames", SCENE_LOOKAHEAD_FRAMES)
+
+    source = open_frame_source(video_path, decoder, decode_width, segment["start_frame"], segment["end_frame"], lookahead_frames)
+    if not source.is_opened():
+        raise RuntimeError(f"Unable to open video file: {video_path}")
+
+    metrics = PipelineMetrics()
+    scene_tracker = SceneTracker(source.fps, source.width)
+    rows, _, scene_sec = analyze_video(source, frames_dir=frames_dir, metrics=metrics, scene_tracker=scene_tracker, **options)
+    return {
+        "index": segment["index"],
+        "rows": rows,
+        "cuts": sorted(set(scene_tracker.cuts)),
+        "last_frame_index": scene_tracker.last_frame_index,
+        "scene_failed": scene_tracker.failed,
+        "scene_sec": scene_sec,
+        "metrics": metrics.snapshot()
+    }
+
+def init_segment_worker(yolo_options=None):
+    """Registers the model loaders and applies the parent's YOLO settings in a worker process."""
+    import process_video  # noqa: F401  # ✅ Registers the model loaders
+    if yolo_options:
+        from object_detection import configure_yolo
+        configure_yolo(**yolo_options)
+
+class FileWorkQueue:
+    """A work queue kept as JSON task files in `pending/`, `claimed/` and `done/` under `root`.
+
+    A worker claims a task by renaming its file from `pending/` to `claimed/`,
+    which is atomic, so any number of workers (local processes, or other machines
+    sharing the directory) can pull from one queue. Results are pickled into
+    `done/`. Tasks must only reference paths every worker can read.
+    """
+    def __init__(self, root):
+        self.root = root
+        for name in ("pending", "claimed", "done"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, state, task_id, extension="json"):
+        return os.path.join(self.root, state, f"{task_id}.{extension}")
+
+    def put(self, task_id, task):
+        """Adds `task` (JSON-serialisable) under `task_id`."""
+        temp_path = os.path.join(self.root, f".{task_id}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(task, f)
+        os.replace(temp_path, self._path("pending", task_id))  # ✅ Workers never see a half-written task
+
+    def claim(self):
+        """Takes the next pending task; returns `(task_id, task)`, or None when none is left."""
+        for file_name in sorted(os.listdir(os.path.join(self.root, "pending"))):
+            task_id = file_name[:-len(".json")]
+            try:
+                os.rename(self._path("pending", task_id), self._path("claimed", task_id))
+            except OSError:
+                continue  # ✅ Another worker claimed it first
+            with open(self._path("claimed", task_id)) as f:
+                return task_id, json.load(f)
+        return None
+
+    def complete(self, task_id, result):
+        """Stores the result (or `{"error": ...}`) of a claimed task."""
+        temp_path = os.path.join(self.root, f".{task_id}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as f:
+            pickle.dump(result, f)
+        os.replace(temp_path, self._path("done", task_id, "pkl"))
+
+    def result(self, task_id):
+        """Returns the stored result of `task_id`, or None while it is not done."""
+        try:
+            with open(self._path("done", task_id, "pkl"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def cancel_pending(self, prefix=""):
+        """Removes the tasks whose id starts with `prefix` that no worker has claimed yet."""
+        pending_dir = os.path.join(self.root, "pending")
+        for file_name in os.listdir(pending_dir):
+            if not file_name.startswith(prefix):
+                continue
+            try:
+                os.remove(os.path.join(pending_dir, file_name))
+            except FileNotFoundError:
+                pass
+
+def run_queue_worker(queue_dir):
+    """Processes `process_segment` tasks from the `FileWorkQueue` at `queue_dir` until none is pending."""
+    work_queue = FileWorkQueue(queue_dir)
+    yolo_options = None
+    while True:
+        claimed = work_queue.claim()
+        if claimed is None:
+            return
+        task_id, task = claimed
+        if task.get("yolo") != yolo_options:
+            yolo_options = task.get("yolo")
+            init_segment_worker(yolo_options)
+        try:
+            result = process_segment(task["video_path"], task["segment"], task["options"], task["frames_dir"])
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        work_queue.complete(task_id, result)
+
+def _pool_results(video_path, segments, options, frames_dir, workers, yolo_options, stop_event):
+    """Yields segment results in order from a pool of spawned worker processes."""
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_segment_worker, initargs=(yolo_options,)) as executor:
+        futures = [executor.submit(process_segment, video_path, segment, options, frames_dir) for segment in segments]
+        try:
+            for future in futures:
+                yield future.result()
+                if stop_event is not None and stop_event.is_set():
+                    return
+        finally:
+            for future in futures:
+                future.cancel()  # ✅ Segments already running finish; queued ones never start
+
+def _queue_results(video_path, segments, options, frames_dir, workers, yolo_options, stop_event, queue_dir):
+    """Yields segment results in order through a `FileWorkQueue`, started with `workers` local worker processes."""
+    work_queue = FileWorkQueue(queue_dir)
+    run_id = uuid.uuid4().hex[:8]
+    task_ids = [f"{run_id}-{segment['index']:05d}" for segment in segments]
+    for task_id, segment in zip(task_ids, segments):
+        work_queue.put(task_id, {"video_path": os.path.abspath(video_path), "segment": segment, "options": options,
+                                 "frames_dir": os.path.abspath(frames_dir), "yolo": yolo_options})
+
+    script = os.path.abspath(__file__)
+    processes = [subprocess.Popen([sys.executable, script, "worker", queue_dir], cwd=os.path.dirname(script))
+                 for _ in range(workers)]
+    try:
+        for task_id in task_ids:
+            while True:
+                result = work_queue.result(task_id)
+                if result is not None:
+                    break
+                if stop_event is not None and stop_event.is_set():
+                    return
+                if all(process.poll() is not None for process in processes) and work_queue.result(task_id) is None:
+                    raise RuntimeError(f"Segment task {task_id} was not completed; every worker has exited")
+                time.sleep(QUEUE_POLL_INTERVAL_SEC)
+            if "error" in result:
+                raise RuntimeError(f"Segment task {task_id} failed: {result['error']}")
+            yield result
+    finally:
+        work_queue.cancel_pending(run_id)
+        for process in processes:
+            process.wait()  # ✅ Workers exit once nothing is pending
+
+def analyze_video_segments(video_path, frames_dir, workers=2, segment_sec=None, queue_dir=None, batch_size=DEFAULT_BATCH_SIZE,
+                           sample_interval_sec=DEFAULT_SAMPLE_INTERVAL_SEC, sampling_mode="grab", detect_scenes=True,
+                           emotion_cascade=False, debug_frames_mode="full", debug_every_n=1, metrics=None, on_frames=None,
+                           on_scene=None, stop_event=None, face_detector=DEFAULT_FACE_DETECTOR, decoder="opencv",
+                           decode_width=DEFAULT_DECODE_WIDTH, memo_distance=DEFAULT_MEMO_DISTANCE):
+    """Like `analyze_video`, but splits the video into segments analysed by `workers` processes.
+
+    Segments start on keyframes (see `plan_segments`); `segment_sec` defaults to
+    an even split across the workers, capped at `DEFAULT_SEGMENT_SEC`. They run on
+    a spawned process pool, or, with `queue_dir`, through a `FileWorkQueue` there,
+    served by `workers` local worker processes (more can be started elsewhere with
+    `python segment_processing.py worker QUEUE_DIR`).
+
+    Results are merged in segment order: rows keep their whole-video timestamps,
+    scene cuts near segment edges are taken from the segment that read past the
+    edge (see `owned_cuts`), and worker metrics are added to `metrics` (gauges
+    labelled by segment). `on_frames` and `on_scene` are called once per finished
+    segment, in order. `stop_event` stops after the segment in progress.
+    Debug frames are written to `frames_dir` by the workers, and `debug_every_n`
+    counts within each segment, as does the `memo_distance` frame memo.
+    Returns `(frame_analysis, scene_changes, scene_sec)` like `analyze_video`.
+    """
+    metrics = metrics or PipelineMetrics()
+    source = FrameSource(video_path)
+    fps, total_frames = source.fps, source.total_frames
+    keyframe_times = source.keyframe_times() if fps > 0 else None
+    source.release()
+
+    workers = max(int(workers), 1)
+    duration_sec = total_frames / fps if fps > 0 else 0.0
+    if segment_sec is None:
+        segment_sec = max(min(DEFAULT_SEGMENT_SEC, duration_sec / workers), MIN_SEGMENT_SEC)
+    segments = plan_segments(total_frames, fps, keyframe_times, segment_sec)
+    workers = min(workers, len(segments))
+    print(f"🧩 Analysing {len(segments)} segments on {workers} workers")
+
+    # ✅ Workers share the CPU: split YOLO's threads between them unless set explicitly
+    yolo_options = yolo_settings()
+    if not yolo_options["threads"]:
+        yolo_options["threads"] = max((os.cpu_count() or 1) // workers, 1)
+    if yolo_options["backend"] != "pytorch":
+        # ✅ Export once here rather than racing to export in every worker
+        export_yolo(yolo_options["backend"], yolo_options["imgsz"], yolo_options["int8"], yolo_options["calibration_dir"],
+                    calibration_videos=[video_path])
+
+    lookahead_frames = SCENE_LOOKAHEAD_FRAMES if detect_scenes and decoder != "ffmpeg" else 0
+    options = {
+        "batch_size": batch_size, "sample_interval_sec": sample_interval_sec, "sampling_mode": sampling_mode,
+        "detect_scenes": detect_scenes, "emotion_cascade": emotion_cascade, "debug_frames_mode": debug_frames_mode,
+        "debug_every_n": debug_every_n, "face_detector": face_detector, "decoder": decoder, "decode_width": decode_width,
+        "lookahead_frames": lookahead_frames, "memo_distance": memo_distance
+    }
+
+    if queue_dir:
+        results = _queue_results(video_path, segments, options, frames_dir, workers, yolo_options, stop_event, queue_dir)
+    else:
+        results = _pool_results(video_path, segments, options, frames_dir, workers, yolo_options, stop_event)
+
+    frame_analysis = []
+    cuts = []
+    last_frame_index = None
+    scene_failed = False
+    scene_sec = 0.0
+    last_cut = 0
+    with metrics.stage("segments"):
+        for result in results:
+            segment = segments[result["index"]]
+            frame_analysis.extend(result["rows"])
+            metrics.merge(result["metrics"], segment=segment["index"])
+            scene_failed = scene_failed or result["scene_failed"]
+            scene_sec += result["scene_sec"]
+            if result["last_frame_index"] is not None:
+                last_frame_index = result["last_frame_index"]
+
+            segment_cuts = owned_cuts(result["cuts"], segment, lookahead_frames, segment is segments[-1])
+            cuts.extend(segment_cuts)
+            if on_scene is not None and detect_scenes and fps > 0:
+                for cut in segment_cuts:
+                    if cut > last_cut:
+                        on_scene(FrameTimecode(last_cut, fps).get_timecode(), FrameTimecode(cut, fps).get_timecode())
+                        last_cut = cut
+            if on_frames is not None and result["rows"]:
+                end_frame = segment["end_frame"] if segment["end_frame"] is not None else total_frames
+                on_frames(result["rows"], end_frame - 1)
+
+    if memo_distance is not None:
+        record_hit_rate(metrics)  # ✅ Over all segments; each segment's own rate is labelled by segment
+    if not detect_scenes:
+        scene_changes = "Scene detection disabled"
+    elif scene_failed:
+        scene_changes = {"error": "❌ Scene detection failed due to an error."}
+    else:
+        scene_changes = scenes_from_cuts(cuts, last_frame_index if last_frame_index is not None else max(total_frames - 1, 0), fps)
+    return frame_analysis, scene_changes, scene_sec
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve segment analysis tasks from a shared work queue directory.")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("queue_dir", help="FileWorkQueue directory (shared with the process that queued the video)")
+    args = parser.parse_args()
+    run_queue_worker(args.queue_dir)
@@ -1,28 +1,60 @@
 import os
 import wave
 import json
+import shutil
+import time
 import subprocess
-import vosk
-from vosk import Model, KaldiRecognizer
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from model_registry import register_model, get_model, is_loaded
+from voice_activity import detect_speech_regions
+from metrics import PipelineMetrics
 
 DEBUG_DIR = "debug_outputs"
 MODEL_PATH = os.path.expanduser("~/vosk-model")
-FFMPEG_PATH = "/opt/homebrew/bin/ffmpeg"  
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH") or shutil.which("ffmpeg")  # ✅ Found on PATH unless overridden
+FFPROBE_PATH = os.environ.get("FFPROBE_PATH") or shutil.which("ffprobe")
+SAMPLE_RATE = 16000
+CHUNK_FRAMES = 4000  # ✅ Frames per recognizer call (16-bit mono, so 2 bytes per frame)
+ASR_WINDOW_SEC = 60.0
+ASR_OVERLAP_SEC = 2.0
 
 # ✅ Ensure debug directory exists
 os.makedirs(DEBUG_DIR, exist_ok=True)
 
-def extract_audio(video_path):
+def load_vosk_model():
+    """Loads the Vosk model from MODEL_PATH."""
+    from vosk import Model
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(" Vosk model not found at the specified path.")
+    return Model(MODEL_PATH)
+
+def make_recognizer(sample_rate=SAMPLE_RATE):
+    """Creates a word-timestamped Vosk recognizer on the shared model."""
+    from vosk import KaldiRecognizer
+    rec = KaldiRecognizer(get_model("vosk"), sample_rate)
+    rec.SetWords(True)
+    return rec
+
+# ✅ The Vosk model is loaded once per process and reused by every call
+register_model("vosk", load_vosk_model)
+
+def ffmpeg_available():
+    """Returns True if an FFmpeg binary was found."""
+    return bool(FFMPEG_PATH) and os.path.exists(FFMPEG_PATH)
+
+def extract_audio(video_path, output_dir=DEBUG_DIR):
     """Extracts audio from video using FFmpeg and ensures the file is valid."""
-    audio_output_path = os.path.join(DEBUG_DIR, "extracted_audio.wav")
+    audio_output_path = os.path.join(output_dir, "extracted_audio.wav")
 
     # ✅ Check if FFmpeg exists
-    if not os.path.exists(FFMPEG_PATH):
-        print(" FFmpeg not found at expected location.")
+    if not ffmpeg_available():
+        print(" FFmpeg not found on PATH.")
         return None
 
     try:
-        command = [FFMPEG_PATH, "-i", video_path, "-vn", "-ac", "1", "-ar", "16000", "-y", audio_output_path]
+        command = [FFMPEG_PATH, "-i", video_path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-y", audio_output_path]
         subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
         if not os.path.exists(audio_output_path) or os.path.getsize(audio_output_path) == 0:
@@ -39,6 +71,227 @@ def extract_audio(video_path):
         print(f" Audio extraction error: {e}")
         return None
 
+def probe_duration(video_path):
+    """Returns the media duration in seconds reported by ffprobe, or None."""
+    if not FFPROBE_PATH:
+        return None
+
+    command = [FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout.strip()
+        return float(output) if output and output != "N/A" else None
+    except Exception as e:
+        print(f" Error probing duration: {e}")
+        return None
+
+def stream_audio(video_path, debug_audio_path=None, chunk_frames=CHUNK_FRAMES, start_sec=None, duration_sec=None):
+    """Yields 16 kHz mono 16-bit PCM chunks piped straight from FFmpeg.
+
+    If `debug_audio_path` is given, the same samples are also written to a WAV file
+    as they arrive. `start_sec`/`duration_sec` restrict the stream to one window.
+    """
+    command = [FFMPEG_PATH, "-nostdin", "-loglevel", "error"]
+    if start_sec:
+        command += ["-ss", f"{start_sec:.3f}"]
+    command += ["-i", video_path]
+    if duration_sec:
+        command += ["-t", f"{duration_sec:.3f}"]
+    command += ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    debug_wav = None
+
+    try:
+        if debug_audio_path:
+            debug_wav = wave.open(debug_audio_path, "wb")
+            debug_wav.setnchannels(1)
+            debug_wav.setsampwidth(2)
+            debug_wav.setframerate(SAMPLE_RATE)
+
+        while True:
+            data = process.stdout.read(chunk_frames * 2)
+            if not data:
+                break
+            if debug_wav:
+                debug_wav.writeframes(data)
+            yield data
+
+        process.wait()
+        if process.returncode != 0:
+            print(f" FFmpeg audio stream error: {process.stderr.read().decode(errors='ignore').strip()}")
+    finally:
+        if debug_wav:
+            debug_wav.close()
+        if process.poll() is None:
+            process.kill()  # ✅ Consumer stopped early
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def read_wav_chunks(audio_path, chunk_frames=CHUNK_FRAMES):
+    """Yields raw PCM chunks from a WAV file."""
+    with wave.open(audio_path, "rb") as wf:
+        while True:
+            data = wf.readframes(chunk_frames)
+            if len(data) == 0:
+                break
+            yield data
+
+def until_stopped(chunks, stop_event=None):
+    """Passes chunks through until `stop_event` (a `threading.Event`) is set."""
+    for data in chunks:
+        if stop_event is not None and stop_event.is_set():
+            break
+        yield data
+
+def transcribe_chunks(chunks, sample_rate=SAMPLE_RATE, metrics=None, on_segment=None):
+    """Feeds PCM chunks to a Vosk recognizer and returns `(transcript, transcript_data)`.
+
+    If `metrics` is given, each `AcceptWaveform` call is recorded as `vosk_chunk`.
+    `on_segment` is called with `{"text", "start", "end"}` for every recognised
+    utterance as soon as Vosk finalises it.
+    """
+    rec = make_recognizer(sample_rate)
+
+    transcript = ""
+    transcript_data = []
+
+    def collect(result):
+        nonlocal transcript
+        if result.get("text"):
+            transcript += result["text"] + " "
+        if "result" in result:
+            transcript_data.extend(result["result"])  # ✅ Store word-level timestamps
+        if on_segment is not None and result.get("text") and result.get("result"):
+            on_segment({"text": result["text"], "start": result["result"][0]["start"], "end": result["result"][-1]["end"]})
+
+    for data in chunks:
+        start = time.perf_counter()
+        accepted = rec.AcceptWaveform(data)
+        if metrics is not None:
+            metrics.observe("vosk_chunk", time.perf_counter() - start)
+            metrics.count("audio_bytes", len(data))
+        if accepted:
+            collect(json.loads(rec.Result()))
+
+    # ✅ Flush the words still buffered after the last chunk
+    collect(json.loads(rec.FinalResult()))
+
+    return transcript, transcript_data
+
+def pcm_chunks(pcm, chunk_frames=CHUNK_FRAMES):
+    """Splits 16-bit PCM bytes into recognizer-sized chunks."""
+    chunk_bytes = chunk_frames * 2
+    for offset in range(0, len(pcm), chunk_bytes):
+        yield pcm[offset:offset + chunk_bytes]
+
+def transcribe_with_vad(pcm, sample_rate=SAMPLE_RATE, metrics=None, on_segment=None):
+    """Transcribes only the speech regions of 16-bit PCM bytes found by the energy VAD.
+
+    Each region gets its own recognizer and its word times (and those passed to
+    `on_segment`) are shifted by the region start.
+    Returns `(transcript, transcript_data, vad_stats)`.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    regions = detect_speech_regions(samples, sample_rate)
+
+    transcript = ""
+    transcript_data = []
+    asr_start = time.perf_counter()
+
+    for start_sample, end_sample in regions:
+        offset_sec = start_sample / sample_rate
+        region_on_segment = None
+        if on_segment is not None:
+            region_on_segment = lambda segment, offset=offset_sec: on_segment(
+                dict(segment, start=segment["start"] + offset, end=segment["end"] + offset))
+        region_transcript, region_words = transcribe_chunks(pcm_chunks(pcm[start_sample * 2:end_sample * 2]), sample_rate,
+                                                            metrics, region_on_segment)
+        transcript += region_transcript
+        transcript_data.extend(
+            dict(word, start=word["start"] + offset_sec, end=word["end"] + offset_sec) for word in region_words
+        )
+
+    asr_time = time.perf_counter() - asr_start
+    audio_sec = len(samples) / sample_rate
+    speech_sec = sum(end - start for start, end in regions) / sample_rate
+    # ✅ Skipped audio is assumed to cost what the transcribed audio cost per second
+    time_saved = asr_time / speech_sec * (audio_sec - speech_sec) if speech_sec > 0 else 0.0
+
+    vad_stats = {
+        "audio_sec": round(audio_sec, 3),
+        "speech_sec": round(speech_sec, 3),
+        "speech_ratio": round(speech_sec / audio_sec, 4) if audio_sec > 0 else 0.0,
+        "speech_regions": len(regions),
+        "asr_time_sec": round(asr_time, 3),
+        "asr_time_saved_est_sec": round(time_saved, 3)
+    }
+    return transcript, transcript_data, vad_stats
+
+def merge_vad_stats(stats_list):
+    """Combines per-window VAD statistics into one summary."""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return {}
+
+    merged = {key: round(sum(stats[key] for stats in stats_list), 3)
+              for key in ("audio_sec", "speech_sec", "speech_regions", "asr_time_sec", "asr_time_saved_est_sec")}
+    merged["speech_ratio"] = round(merged["speech_sec"] / merged["audio_sec"], 4) if merged["audio_sec"] > 0 else 0.0
+    return merged
+
+def transcribe_window(video_path, window_start, window_end, core_start, core_end, vad=False):
+    """Transcribes one audio window and returns `(words, vad_stats)` on the global timeline.
+
+    Only words whose midpoint falls in `[core_start, core_end)` are kept, so words
+    in the overlap between neighbouring windows are returned by exactly one of them.
+    """
+    duration_sec = None if window_end == float("inf") else window_end - window_start
+    chunks = stream_audio(video_path, start_sec=window_start, duration_sec=duration_sec)
+    vad_stats = None
+    if vad:
+        _, window_words, vad_stats = transcribe_with_vad(b"".join(chunks))
+    else:
+        _, window_words = transcribe_chunks(chunks)
+
+    words = []
+    for word in window_words:
+        word = dict(word, start=word["start"] + window_start, end=word["end"] + window_start)
+        midpoint = (word["start"] + word["end"]) / 2
+        if core_start <= midpoint < core_end:
+            words.append(word)
+    return words, vad_stats
+
+def transcribe_parallel(video_path, workers, window_sec=ASR_WINDOW_SEC, overlap_sec=ASR_OVERLAP_SEC, vad=False):
+    """Transcribes overlapping audio windows on a process pool and merges the words.
+
+    Each worker process loads its own Vosk model through the model registry.
+    Returns `(transcript, transcript_data, vad_stats)`, or None if the duration
+    could not be determined.
+    """
+    duration = probe_duration(video_path)
+    if not duration:
+        return None
+
+    windows = []
+    core_start = 0.0
+    while core_start < duration:
+        core_end = min(core_start + window_sec, duration)
+        window_start = max(core_start - overlap_sec, 0.0)
+        if core_end < duration:
+            windows.append((video_path, window_start, core_end + overlap_sec, core_start, core_end))
+        else:
+            # ✅ The last window reads and owns everything up to the end of the stream
+            windows.append((video_path, window_start, float("inf"), core_start, float("inf")))
+        core_start = core_end
+
+    print(f"🔊 Transcribing {len(windows)} windows of {window_sec:.0f}s on {workers} processes")
+    # ✅ Spawned workers avoid forking a parent that already holds torch/TF threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        window_results = list(executor.map(transcribe_window, *zip(*windows), [vad] * len(windows)))
+
+    transcript_data = sorted((word for words, _ in window_results for word in words), key=lambda word: word["start"])
+    transcript = " ".join(word["word"] for word in transcript_data)
+    return transcript, transcript_data, merge_vad_stats([stats for _, stats in window_results])
+
 def generate_srt(transcript_data, srt_file_path):
     """Generates an SRT file from transcript data with timestamps."""
     try:
@@ -59,52 +312,90 @@ def generate_srt(transcript_data, srt_file_path):
     except Exception as e:
         print(f" Error writing SRT file: {e}")
 
-def extract_speech(video_path):
-    """Extracts speech from a video using Vosk and generates subtitles."""
+def extract_speech(video_path, stream=True, keep_debug_audio=False, workers=1, vad=False, stats=None, output_dir=DEBUG_DIR,
+                   metrics=None, on_segment=None, stop_event=None, words=None):
+    """Extracts speech from a video using Vosk and generates subtitles.
+
+    With `stream=True` (default) FFmpeg pipes PCM straight into the recognizer, so
+    transcription starts immediately and no WAV is written unless
+    `keep_debug_audio` is set. `stream=False` uses the extract-then-read WAV path.
+    With `workers > 1` overlapping windows are transcribed on a process pool
+    (no debug WAV is written in that mode). With `vad=True` only the speech
+    regions found by the energy VAD are sent to Vosk; if a `stats` dict is
+    passed, the speech ratio and estimated ASR time saved are written into it.
+    Transcript, subtitles and debug audio are written to `output_dir`.
+    If `metrics` (a `PipelineMetrics`) is given, the `asr` and `srt` stages and the
+    per-chunk Vosk latency are recorded in it; parallel ASR workers only report wall time.
+    `on_segment` receives each transcript segment as it is recognised (not in
+    parallel mode), and setting `stop_event` stops feeding audio to the recognizer.
+    If a `words` list is passed, the word-level timings are appended to it.
+    """
+    metrics = metrics or PipelineMetrics()
     try:
-        # ✅ Ensure Vosk model exists before processing
-        if not os.path.exists(MODEL_PATH):
+        # ✅ Ensure Vosk model exists before processing (unless one is already loaded)
+        if not is_loaded("vosk") and not os.path.exists(MODEL_PATH):
             raise FileNotFoundError(" Vosk model not found at the specified path.")
 
-        model = Model(MODEL_PATH)
-        audio_path = extract_audio(video_path)
+        parallel_result = None
+        vad_stats = {}
+        if workers > 1 and ffmpeg_available():
+            with metrics.stage("asr"):
+                parallel_result = transcribe_parallel(video_path, workers, vad=vad)
 
-        if not audio_path:
-            return "No speech detected.", None, None
+        if parallel_result is not None:
+            audio_path = None
+            transcript, transcript_data, vad_stats = parallel_result
+        elif stream:
+            if not ffmpeg_available():
+                print(" FFmpeg not found on PATH.")
+                return "No speech detected.", None, None
 
-        wf = wave.open(audio_path, "rb")
+            audio_path = os.path.join(output_dir, "extracted_audio.wav") if keep_debug_audio else None
+            chunks = until_stopped(stream_audio(video_path, debug_audio_path=audio_path), stop_event)
+            with metrics.stage("asr"):
+                if vad:
+                    # ✅ The VAD needs the whole signal, so the pipe is drained into memory first
+                    transcript, transcript_data, vad_stats = transcribe_with_vad(b"".join(chunks), metrics=metrics, on_segment=on_segment)
+                else:
+                    transcript, transcript_data = transcribe_chunks(chunks, metrics=metrics, on_segment=on_segment)
+        else:
+            with metrics.stage("audio_extraction"):
+                audio_path = extract_audio(video_path, output_dir)
 
-        # ✅ Ensure audio file is not empty
-        if wf.getnframes() == 0:
-            print(" Extracted audio contains no valid frames!")
-            wf.close()
-            return " No speech detected.", audio_path, None
+            if not audio_path:
+                return "No speech detected.", None, None
 
-        rec = KaldiRecognizer(model, wf.getframerate())
-        rec.SetWords(True)
+            with wave.open(audio_path, "rb") as wf:
+                sample_rate = wf.getframerate()
 
-        transcript = ""
-        transcript_data = []
+                # ✅ Ensure audio file is not empty
+                if wf.getnframes() == 0:
+                    print(" Extracted audio contains no valid frames!")
+                    return " No speech detected.", audio_path, None
 
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                transcript += result["text"] + " "
-                if "result" in result:
-                    transcript_data.extend(result["result"])  # ✅ Store word-level timestamps
+            chunks = until_stopped(read_wav_chunks(audio_path), stop_event)
+            with metrics.stage("asr"):
+                if vad:
+                    transcript, transcript_data, vad_stats = transcribe_with_vad(b"".join(chunks), sample_rate, metrics, on_segment)
+                else:
+                    transcript, transcript_data = transcribe_chunks(chunks, sample_rate, metrics, on_segment)
+
+        if words is not None:
+            words.extend(transcript_data)
 
-        wf.close()
+        if stats is not None and vad_stats:
+            stats.update(vad_stats)
+            print(f"🔇 VAD kept {vad_stats['speech_ratio']:.0%} of the audio, ~{vad_stats['asr_time_saved_est_sec']:.1f}s of ASR saved")
 
-        transcript_file_path = os.path.join(DEBUG_DIR, "transcription.txt")
+        os.makedirs(output_dir, exist_ok=True)
+        transcript_file_path = os.path.join(output_dir, "transcription.txt")
         with open(transcript_file_path, "w", encoding="utf-8") as f:
             f.write(transcript.strip() if transcript.strip() else " No speech detected.")
 
         # ✅ Generate & Save SRT File
-        srt_file_path = os.path.join(DEBUG_DIR, "subtitles.srt")
-        generate_srt(transcript_data, srt_file_path)
+        srt_file_path = os.path.join(output_dir, "subtitles.srt")
+        with metrics.stage("srt"):
+            generate_srt(transcript_data, srt_file_path)
 
         # ✅ Debugging output
         print(f"✅ Transcript saved: {transcript_file_path}")
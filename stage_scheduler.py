@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class StageScheduler:
+    """Runs independent pipeline stages in parallel worker threads and times each one.
+
+    With `metrics` (a `PipelineMetrics`), each stage's wall and CPU time is also
+    recorded there and, when profiling is enabled, the stage's own thread runs
+    under cProfile; threads the stage starts (e.g. a `BoundedPipeline`) profile themselves.
+    """
+    def __init__(self, max_workers=None, metrics=None):
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.stages = []
+
+    def add_stage(self, name, func, *args, **kwargs):
+        """Registers a stage to run as `func(*args, **kwargs)`."""
+        self.stages.append((name, func, args, kwargs))
+
+    def run(self):
+        """Runs all stages and returns `(outputs, timings)` keyed by stage name.
+
+        Timings are wall-clock seconds per stage. If a stage raises, the error is
+        re-raised once every stage has finished.
+        """
+        outputs = {}
+        timings = {}
+        if not self.stages:
+            return outputs, timings
+
+        def timed(name, func, args, kwargs):
+            start = time.perf_counter()
+            try:
+                if self.metrics is None:
+                    return func(*args, **kwargs), time.perf_counter() - start
+                with self.metrics.stage(name), self.metrics.profiling(name):
+                    result = func(*args, **kwargs)
+                return result, time.perf_counter() - start
+            except Exception as e:
+                print(f"❌ Error in stage {func.__name__}: {e}")
+                raise
+
+        max_workers = self.max_workers or len(self.stages)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as executor:
+            futures = {
+                name: executor.submit(timed, name, func, args, kwargs)
+                for name, func, args, kwargs in self.stages
+            }
+
+        # ✅ Executor has joined every stage here, so results are ready
+        for name, future in futures.items():
+            outputs[name], timings[name] = future.result()
+
+        return outputs, timings
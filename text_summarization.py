@@ -1,10 +1,33 @@
-import spacy
 from langdetect import detect
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.summarizers.lsa import LsaSummarizer
+from model_registry import register_model, get_model
 
-# Load SpaCy English model
-nlp = spacy.load("en_core_web_sm")
+SPACY_MODEL = "en_core_web_sm"
+# ✅ Summarization only needs tokens and sentence boundaries, so the heavy components are never loaded
+SPACY_EXCLUDED = ["tagger", "parser", "attribute_ruler", "lemmatizer", "ner"]
+PIPE_BATCH_SIZE = 256
+PAUSE_SEC = 0.7  # ✅ A silence this long between words ends a sentence
+MAX_SENTENCE_WORDS = 40  # ✅ Force a break in long unpaused runs
+SUMMARY_SENTENCES = 3
+
+def load_spacy_model():
+    """Loads the SpaCy English model with only tokenization and sentence splitting enabled.
+
+    The statistical `senter` (off by default in the small English model) replaces
+    the dependency parser for sentence boundaries; the rule-based `sentencizer`
+    is the fallback if the package has no `senter`.
+    """
+    import spacy
+    nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED)
+    if "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
+    elif "senter" not in nlp.pipe_names:
+        nlp.add_pipe("sentencizer")
+    return nlp
+
+# SpaCy is loaded lazily, once per process, through the model registry
+register_model("spacy", load_spacy_model)
 
 def detect_language(text):
     """Detects the language of a given text."""
@@ -13,29 +36,87 @@ def detect_language(text):
     except:
         return "unknown"  # If detection fails, return 'unknown'
 
+def segment_by_pauses(words, pause_sec=PAUSE_SEC, max_words=MAX_SENTENCE_WORDS):
+    """Groups Vosk word timings (`word`, `start`, `end`) into sentences at speech pauses.
+
+    Vosk output has no punctuation, so a gap of at least `pause_sec` between two
+    words (or `max_words` words without one) is treated as a sentence break.
+    """
+    sentences = []
+    current = []
+    last_end = None
+
+    for word in words:
+        if current and (word["start"] - last_end >= pause_sec or len(current) >= max_words):
+            sentences.append(" ".join(current))
+            current = []
+        current.append(word["word"])
+        last_end = word["end"]
+
+    if current:
+        sentences.append(" ".join(current))
+    return sentences
+
 class CustomTokenizer:
-    """Custom tokenizer for Sumy that uses SpaCy instead of NLTK."""
-    def __init__(self, language):
+    """Custom tokenizer for Sumy that uses SpaCy instead of NLTK.
+
+    The text is parsed once in `to_sentences` and the word lists of every
+    sentence are kept, so `to_words` does not run SpaCy again. With `sentences`
+    (e.g. from `segment_by_pauses`) the given segmentation is used instead and
+    the sentences are only tokenized, in batches with `nlp.pipe`.
+    """
+    def __init__(self, language, sentences=None):
         self.language = language
+        self.sentences = sentences
+        self._words = {}
+
+    @staticmethod
+    def _doc_words(tokens):
+        return [token.text for token in tokens if not token.is_punct]  # Exclude punctuation
 
     def to_sentences(self, text):
-        """Tokenizes text into sentences using SpaCy."""
-        doc = nlp(text)
-        return [sent.text for sent in doc.sents]
+        """Tokenizes text into sentences using SpaCy (or returns the pre-segmented sentences)."""
+        nlp = get_model("spacy")
+
+        if self.sentences is not None:
+            sentences = [sentence.strip() for sentence in self.sentences if sentence.strip()]
+            # ✅ Tokenizer only: the segmentation is already known
+            for sentence, doc in zip(sentences, nlp.pipe(sentences, batch_size=PIPE_BATCH_SIZE, disable=nlp.pipe_names)):
+                self._words[sentence] = self._doc_words(doc)
+            return sentences
+
+        sentences = []
+        for sent in nlp(text).sents:
+            sentence = sent.text.strip()  # ✅ Sumy strips sentences before calling to_words
+            if sentence:
+                sentences.append(sentence)
+                self._words[sentence] = self._doc_words(sent)
+        return sentences
 
     def to_words(self, text):
-        """Tokenizes text into words using SpaCy."""
-        doc = nlp(text)
-        return [token.text for token in doc if not token.is_punct]  # Exclude punctuation
+        """Tokenizes text into words, reusing the tokens from `to_sentences` when possible."""
+        words = self._words.get(text)
+        if words is None:
+            words = self._doc_words(get_model("spacy").make_doc(text))  # ✅ Tokenizer only, no pipeline
+            self._words[text] = words
+        return words
 
-def summarize_text(text):
-    """Summarizes text using Sumy with a custom SpaCy tokenizer."""
+def summarize_text(text, words=None, sentence_count=SUMMARY_SENTENCES):
+    """Summarizes text using Sumy with a custom SpaCy tokenizer.
+
+    If Vosk word timings are given as `words`, sentences are split at speech
+    pauses instead of by SpaCy, since the transcript has no punctuation.
+    """
     if not text or text.strip() == "":
         return "No speech detected."
 
+    sentences = segment_by_pauses(words) if words else None
+    if sentences:
+        text = " ".join(sentences)  # ✅ One paragraph; the tokenizer supplies the sentence splits
+
     # Use CustomTokenizer to override Sumy's default NLTK tokenizer
-    parser = PlaintextParser.from_string(text, CustomTokenizer("english"))
+    parser = PlaintextParser.from_string(text, CustomTokenizer("english", sentences))
     summarizer = LsaSummarizer()
-    summary = summarizer(parser.document, 3)  # Extract top 3 sentences
-    
+    summary = summarizer(parser.document, sentence_count)  # Extract top sentences
+
     return " ".join([str(sentence) for sentence in summary])
@@ -0,0 +1,59 @@
+import numpy as np
+
+FRAME_MS = 30
+PADDING_SEC = 0.3  # ✅ Audio kept on each side of a speech region so word edges aren't clipped
+MIN_GAP_SEC = 0.5  # ✅ Regions closer than this are merged into one
+ENERGY_MARGIN_DB = 12.0  # ✅ How far above the noise floor a frame must be to count as speech
+MIN_ENERGY_DB = -50.0  # ✅ Frames quieter than this are never speech
+MAX_THRESHOLD_DB = -30.0  # ✅ Frames louder than this always count, even when the clip has no quiet floor
+
+def frame_energy_db(samples, sample_rate, frame_ms=FRAME_MS):
+    """Returns the RMS energy in dBFS of each `frame_ms` frame of int16 samples."""
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float32), frame_length
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) + 1e-10
+    return 20.0 * np.log10(rms), frame_length
+
+def detect_speech_regions(samples, sample_rate, frame_ms=FRAME_MS, padding_sec=PADDING_SEC, min_gap_sec=MIN_GAP_SEC,
+                          energy_margin_db=ENERGY_MARGIN_DB, min_energy_db=MIN_ENERGY_DB, max_threshold_db=MAX_THRESHOLD_DB):
+    """Finds speech in int16 PCM samples with an adaptive energy threshold.
+
+    Returns a list of `(start_sample, end_sample)` regions, already padded and merged.
+    A clip without a quiet stretch to measure the noise floor against (e.g.
+    continuous speech or music) is returned as one region unless it is silent.
+    """
+    energy_db, frame_length = frame_energy_db(samples, sample_rate, frame_ms)
+    if len(energy_db) == 0:
+        return []
+
+    # ✅ The 10th percentile of frame energy approximates the background noise level
+    floor_db, loud_db = np.percentile(energy_db, [10, 90])
+    if loud_db - floor_db < energy_margin_db:
+        return [(0, len(samples))] if loud_db > min_energy_db else []
+    threshold = min(max(floor_db + energy_margin_db, min_energy_db), max_threshold_db)
+    active = energy_db > threshold
+
+    # ✅ Pad and bridge short gaps by dilating the activity mask
+    pad_frames = int(round(padding_sec * 1000 / frame_ms))
+    gap_frames = int(round(min_gap_sec * 1000 / frame_ms))
+    dilation = pad_frames + gap_frames // 2
+    if dilation > 0 and active.any():
+        active = np.convolve(active.astype(np.int8), np.ones(2 * dilation + 1, dtype=np.int8), mode="same") > 0
+
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # ✅ Undo the part of the dilation that only served to bridge gaps
+    trim = dilation - pad_frames
+    regions = []
+    for start, end in zip(starts, ends):
+        start_sample = 0 if start == 0 else min((start + trim) * frame_length, len(samples))
+        end_sample = len(samples) if end >= len(active) else max((end - trim) * frame_length, start_sample)
+        if end_sample > start_sample:
+            regions.append((int(start_sample), int(end_sample)))
+    return regions
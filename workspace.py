@@ -0,0 +1,64 @@
+import os
+import time
+import uuid
+import shutil
+
+JOBS_DIR = "jobs"
+STALE_JOB_HOURS = 24
+
+def new_job_id():
+    """Returns a short random job ID."""
+    return uuid.uuid4().hex[:12]
+
+class JobWorkspace:
+    """Per-job directory tree so concurrent jobs never write to the same files.
+
+    Layout: `<root>/<job_id>/{uploads,debug_outputs,debug_frames,output}`.
+    """
+    def __init__(self, job_id=None, root=JOBS_DIR):
+        self.job_id = job_id or new_job_id()
+        self.root = os.path.join(root, self.job_id)
+        self.upload_dir = os.path.join(self.root, "uploads")
+        self.debug_dir = os.path.join(self.root, "debug_outputs")
+        self.frames_dir = os.path.join(self.root, "debug_frames")
+        self.output_dir = os.path.join(self.root, "output")
+
+        for directory in (self.upload_dir, self.debug_dir, self.frames_dir, self.output_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def upload_path(self, file_name):
+        """Returns where an uploaded file should be saved, keeping only its base name."""
+        return os.path.join(self.upload_dir, os.path.basename(file_name) or "uploaded_video.mp4")
+
+    def contains(self, path):
+        """Returns True if `path` lies inside this workspace (and is deleted with it)."""
+        root = os.path.abspath(self.root)
+        return os.path.commonpath([os.path.abspath(path), root]) == root
+
+    def touch(self):
+        """Marks the workspace as in use so stale-job cleanup leaves it alone."""
+        os.utime(self.root, None)
+
+    def remove(self):
+        """Deletes the whole workspace."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+def cleanup_stale_jobs(root=JOBS_DIR, max_age_hours=STALE_JOB_HOURS, keep=()):
+    """Removes job workspaces not modified for `max_age_hours`, except the IDs in `keep`."""
+    if not os.path.isdir(root):
+        return []
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = []
+    for job_id in os.listdir(root):
+        job_dir = os.path.join(root, job_id)
+        if job_id in keep or not os.path.isdir(job_dir):
+            continue
+        try:
+            if os.path.getmtime(job_dir) < cutoff:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed.append(job_id)
+                print(f"🗑️ Deleted stale job workspace: {job_dir}")
+        except OSError:
+            pass  # ✅ Another session removed it first
+    return removed
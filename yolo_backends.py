@@ -0,0 +1,278 @@
+import os
+import glob
+import json
+import shutil
+import cv2
+import numpy as np
+
+YOLO_BACKENDS = ("pytorch", "onnx", "openvino")  # ✅ onnx/openvino need requirements-optional.txt
+DEFAULT_IMGSZ = 640
+CONF_THRESHOLD = 0.25  # ✅ Same defaults as ultralytics predict, so every backend filters alike
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+CALIBRATION_FRAMES = 200
+PAD_VALUE = 114  # ✅ Grey letterbox padding, as in YOLOv8 training
+
+def artifact_path(weights, backend, imgsz=DEFAULT_IMGSZ, int8=False):
+    """Returns where the exported model for these settings is cached, next to `weights`."""
+    stem = os.path.splitext(os.path.abspath(weights))[0] + f"_{imgsz}" + ("_int8" if int8 else "")
+    return stem + ".onnx" if backend == "onnx" else stem + "_openvino_model"
+
+def metadata_path(artifact):
+    """The sidecar JSON with class names; written last, so its presence marks a finished export."""
+    return artifact + ".json"
+
+def default_calibration_dir(weights):
+    return os.path.splitext(os.path.abspath(weights))[0] + "_calibration"
+
+def calibration_images(directory):
+    """Returns the calibration JPEGs in `directory` (empty if it does not exist)."""
+    return sorted(glob.glob(os.path.join(directory, "*.jpg"))) if directory else []
+
+def build_calibration_set(video_paths, output_dir, count=CALIBRATION_FRAMES, max_side=DEFAULT_IMGSZ):
+    """Samples up to `count` frames spread evenly over `video_paths` into `output_dir` as JPEGs.
+
+    Frames are downscaled to `max_side` first; the INT8 calibration only ever
+    sees them letterboxed to the model input anyway. Returns the number written.
+    """
+    from frame_source import FrameSource
+
+    os.makedirs(output_dir, exist_ok=True)
+    per_video = max(count // max(len(video_paths), 1), 1)
+    written = 0
+
+    for video_path in video_paths:
+        source = FrameSource(video_path)
+        try:
+            if not source.is_opened() or source.fps <= 0 or source.total_frames <= 0:
+                print(f"⚠️ Skipping calibration video {video_path}: cannot read it")
+                continue
+            interval_sec = max(source.total_frames / source.fps / per_video, 1 / source.fps)
+            stem = os.path.splitext(os.path.basename(video_path))[0]
+            for frame_index, _, frame in source.sample(interval_sec, mode="seek"):
+                if written >= count:
+                    break
+                scale = max_side / max(frame.shape[:2])
+                if scale < 1:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                cv2.imwrite(os.path.join(output_dir, f"{stem}_{frame_index:07d}.jpg"), frame)
+                written += 1
+        finally:
+            source.release()
+
+    print(f"✅ Wrote {written} calibration frames to {output_dir}")
+    return written
+
+def letterbox(frame, imgsz=DEFAULT_IMGSZ):
+    """Fits `frame` into an `imgsz` square keeping its aspect ratio.
+
+    Returns the padded image, the resize ratio and the `(left, top)` padding.
+    """
+    height, width = frame.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    left, top = (imgsz - new_width) // 2, (imgsz - new_height) // 2
+    image = cv2.copyMakeBorder(frame, top, imgsz - new_height - top, left, imgsz - new_width - left,
+                               cv2.BORDER_CONSTANT, value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return image, ratio, (left, top)
+
+def preprocess(frames, imgsz=DEFAULT_IMGSZ):
+    """Letterboxes BGR frames into one float32 RGB NCHW batch scaled to [0, 1]."""
+    images, transforms = [], []
+    for frame in frames:
+        image, ratio, padding = letterbox(frame, imgsz)
+        images.append(image)
+        transforms.append((ratio, padding))
+    batch = np.ascontiguousarray(np.stack(images)[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+    batch *= 1 / 255.0
+    return batch, transforms
+
+def postprocess(output, transforms, frame_shapes, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, max_det=MAX_DETECTIONS):
+    """Turns raw YOLOv8 output `(batch, 4 + classes, anchors)` into per-frame rows.
+
+    Each frame gets a float32 array of `[x1, y1, x2, y2, confidence, class_id]`
+    in original frame pixels, after class-aware NMS, highest confidence first.
+    """
+    results = []
+    for prediction, (ratio, (left, top)), (height, width) in zip(output, transforms, frame_shapes):
+        prediction = prediction.T  # ✅ One row per anchor: cx, cy, w, h, class scores...
+        scores = prediction[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences > conf
+        boxes, class_ids, confidences = prediction[keep, :4].copy(), class_ids[keep], confidences[keep]
+        if not len(boxes):
+            results.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+
+        boxes[:, :2] -= boxes[:, 2:] / 2  # ✅ Centre to top-left corner, as NMSBoxes expects
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-confidences[indices], kind="stable")][:max_det]
+
+        corners = (boxes[indices, :2] - (left, top)) / ratio
+        rows = np.column_stack([corners, corners + boxes[indices, 2:] / ratio, confidences[indices], class_ids[indices]])
+        rows[:, [0, 2]] = rows[:, [0, 2]].clip(0, width)
+        rows[:, [1, 3]] = rows[:, [1, 3]].clip(0, height)
+        results.append(rows.astype(np.float32))
+    return results
+
+class DetectionBoxes:
+    def __init__(self, data):
+        self.data = data  # ✅ ndarray rows; `.tolist()` is all parse_detections needs
+
+class DetectionResult:
+    """The parts of an ultralytics `Results` object that `object_detection.parse_detections` reads."""
+    def __init__(self, names, rows):
+        self.names = names
+        self.boxes = DetectionBoxes(rows)
+
+class ExportedDetector:
+    """Runs an exported YOLOv8 model with the call signature of `ultralytics.YOLO`.
+
+    Pre- and post-processing (letterbox, NMS) happen here in NumPy/OpenCV, so
+    neither torch nor ultralytics is imported at inference time. `infer(batch)`
+    maps an NCHW float32 batch to the raw model output and must be thread-safe.
+    """
+    thread_safe = True  # ✅ No per-call state here, so sessions need not take turns
+
+    def __init__(self, names, imgsz, infer):
+        self.names = names
+        self.imgsz = imgsz
+        self.infer = infer
+
+    def __call__(self, frames, verbose=False):
+        frames = frames if isinstance(frames, list) else [frames]
+        batch, transforms = preprocess(frames, self.imgsz)
+        output = self.infer(batch)
+        rows = postprocess(output, transforms, [frame.shape[:2] for frame in frames])
+        return [DetectionResult(self.names, frame_rows) for frame_rows in rows]
+
+class OnnxDetector(ExportedDetector):
+    def __init__(self, path, names, imgsz, threads=0):
+        super().__init__(names, imgsz, self._run)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads  # ✅ 0 = one thread per physical core
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class OpenVinoDetector(ExportedDetector):
+    def __init__(self, path, names, imgsz, threads=0):
+        super().__init__(names, imgsz, self._run)
+        import openvino as ov
+        core = ov.Core()
+        model = core.read_model(model_xml(path))
+        model.reshape([-1, 3, imgsz, imgsz])  # ✅ Any batch size, fixed input size
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(model, "CPU", config)
+
+    def _run(self, batch):
+        request = self.compiled.create_infer_request()  # ✅ One request per call: safe across sessions' threads
+        request.infer({0: batch})
+        return request.get_output_tensor(0).data.copy()
+
+def model_xml(directory):
+    """Returns the OpenVINO IR `.xml` inside an exported model directory."""
+    matches = sorted(glob.glob(os.path.join(directory, "*.xml")))
+    if not matches:
+        raise FileNotFoundError(f"No OpenVINO model (.xml) in {directory}")
+    return matches[0]
+
+def _replace(source, target):
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(source, target)
+
+def _quantize_onnx(source, target, images, imgsz):
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            return None if path is None else {input_name: preprocess([cv2.imread(path)], imgsz)[0]}
+
+    staging = target + ".tmp"
+    # ✅ Convolutions only: the head's Concat mixes pixel boxes with 0-1 class scores,
+    # and one INT8 scale for both wipes out the scores
+    quantize_static(source, staging, FrameReader(), quant_format=QuantFormat.QDQ, op_types_to_quantize=["Conv"],
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    _replace(staging, target)
+
+def _quantize_openvino(source, target, images, imgsz):
+    import nncf
+    import openvino as ov
+
+    model = ov.Core().read_model(model_xml(source))
+    dataset = nncf.Dataset(images, lambda path: preprocess([cv2.imread(path)], imgsz)[0])
+    quantized = nncf.quantize(
+        model, dataset, preset=nncf.QuantizationPreset.MIXED, subset_size=len(images),
+        ignored_scope=nncf.IgnoredScope(types=["Multiply", "Subtract", "Sigmoid"])  # ✅ Keep the box decoding in float
+    )
+
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    ov.save_model(quantized, os.path.join(staging, os.path.basename(model_xml(source))))
+    _replace(staging, target)
+
+def export_model(weights, backend, imgsz=DEFAULT_IMGSZ, int8=False, calibration_dir=None):
+    """Exports `weights` to `backend` once and returns the cached artifact path.
+
+    The float model is exported with ultralytics (dynamic batch). INT8 models are
+    quantized from it with ONNX Runtime or NNCF, calibrated on the JPEG frames in
+    `calibration_dir` (see `build_calibration_set`).
+    """
+    if backend not in YOLO_BACKENDS[1:]:
+        raise ValueError(f"Cannot export to backend: {backend}")
+
+    target = artifact_path(weights, backend, imgsz, int8)
+    if os.path.exists(metadata_path(target)):
+        return target
+
+    if int8:
+        images = calibration_images(calibration_dir)
+        if not images:
+            raise ValueError(f"INT8 export needs calibration frames in {calibration_dir}; build them with build_calibration_set()")
+        source = export_model(weights, backend, imgsz)
+        with open(metadata_path(source), "r", encoding="utf-8") as f:
+            names = json.load(f)["names"]
+        print(f"⏳ Quantizing {source} to INT8 with {len(images)} calibration frames")
+        if backend == "onnx":
+            _quantize_onnx(source, target, images, imgsz)
+        else:
+            _quantize_openvino(source, target, images, imgsz)
+    else:
+        from ultralytics import YOLO
+        model = YOLO(weights)
+        names = model.names
+        print(f"⏳ Exporting {weights} to {backend} ({imgsz}px)")
+        _replace(model.export(format=backend, imgsz=imgsz, dynamic=True, half=False), target)
+
+    with open(metadata_path(target), "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "imgsz": imgsz, "int8": int8, "names": {int(k): v for k, v in names.items()}}, f)
+    print(f"✅ Exported model cached: {target}")
+    return target
+
+def load_exported(path, threads=0):
+    """Loads an artifact from `export_model` as an `ExportedDetector`."""
+    with open(metadata_path(path), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    names = {int(class_id): name for class_id, name in meta["names"].items()}
+    detector = OnnxDetector if meta["backend"] == "onnx" else OpenVinoDetector
+    return detector(path, names, meta["imgsz"], threads)